@@ -1,9 +1,13 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
 from dotenv import load_dotenv
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from bson.objectid import ObjectId 
-import bcrypt
+from bson.codec_options import TypeDecoder, TypeRegistry
+from argon2 import PasswordHasher
 from pydantic import BaseModel
 
 # Load .env file
@@ -15,27 +19,69 @@ MONGO_URI = os.getenv("MONGO_URI")
 if not MONGO_URI:
     raise Exception("MONGO_URI not found! Check your .env file and make sure it’s in project root.")
 
-# Connect to MongoDB
-client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)  # 5s timeout
+_CLIENT_OPTIONS = dict(
+    maxPoolSize=100,
+    serverSelectionTimeoutMS=5000,  # 5s timeout
+    retryWrites=True,
+    compressors="zstd,zlib",  # wire compression, zlib if backports.zstd isn't installed
+)
 
-try:
-    client.admin.command("ping")
-    print("Connected to MongoDB!")
-except Exception as e:
-    print("Could not connect:", e)
+# Both clients connect on first use, so importing this module opens no
+# connections or monitor threads; a process only pays for the client it uses.
+
+# Sync client (one shared, thread-safe client per process) for the pipeline and
+# scripts, with no idle pool: each pooled connection counts against the
+# cluster's connection limit.
+client = MongoClient(MONGO_URI, connect=False, **_CLIENT_OPTIONS)
+
+# Asyncio client for the API endpoints, so queries are awaited instead of holding
+# a threadpool worker. It binds to the server's event loop on first use, and
+# only this request-serving client keeps a few connections warm.
+async_client = AsyncMongoClient(MONGO_URI, minPoolSize=10, **_CLIENT_OPTIONS)
 
 
 # DATABASE AND COLLECTION NAMES
-client = MongoClient(MONGO_URI)
 db = client["ProjectDB"]        # Your database
 users = db["users"]  
 tickets = db["tickets"]
+classification_cache = db["classification_cache"]  # image hash -> severity
+
+async_db = async_client["ProjectDB"]
+async_users = async_db["users"]
+async_tickets = async_db["tickets"]
+async_leases = async_db["leases"]  # single-worker background jobs (watchers.run_as_leader)
+
+
+class _ObjectIdAsStr(TypeDecoder):
+    bson_type = ObjectId
+
+    def transform_bson(self, value):
+        return str(value)
+
+
+# Read-only views whose ObjectIds decode straight to str, ready for JSON responses.
+# Don't write back _ids read through them: a str never matches an ObjectId _id.
+_JSON_CODEC_OPTIONS = async_db.codec_options.with_options(type_registry=TypeRegistry([_ObjectIdAsStr()]))
+async_users_json = async_users.with_options(codec_options=_JSON_CODEC_OPTIONS)
+async_tickets_json = async_tickets.with_options(codec_options=_JSON_CODEC_OPTIONS)
+
+_UTC = timezone.utc
+
+# Argon2id hasher for new passwords (legacy bcrypt hashes are still verified in auth.py)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+# Password hashing is CPU-bound, run it off the event loop
+password_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
 
 
 # EDITING THE DATABASE
-def create_user(name, email, password):
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_pool, password_hasher.hash, password)
+
+async def create_user(name, email, password):
     # password crypt
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    password_hash = await hash_password(password)
 
     user_data = {
         "name": name,
@@ -45,66 +91,183 @@ def create_user(name, email, password):
         "points": 0
     }
 
-    result = users.insert_one(user_data)
+    result = await async_users.insert_one(user_data)
     return str(result.inserted_id)
 
-def create_ticket(image_url, location, severity, description, claimed=False, priority: str | None = None):
-    ticket_data = {
+def _ticket_doc(image_url, location, severity, description, claimed=False, priority: str | None = None, timestamp: datetime | None = None):
+    return {
         "image_url": image_url,
         "location": location,
         "severity": severity,           # 1-10 scale
         "description": description,
         "claimed": claimed,             # whether user claimed the ticket
-        "timestamp": datetime.now(timezone.utc),
+        "timestamp": timestamp or datetime.now(_UTC),
         "resolved": False,
         "priority": priority
     }
-    result = tickets.insert_one(ticket_data)
+
+async def create_ticket(image_url, location, severity, description, claimed=False, priority: str | None = None):
+    ticket_data = _ticket_doc(image_url, location, severity, description, claimed, priority)
+    result = await async_tickets.insert_one(ticket_data)
     return str(result.inserted_id)
 
-def resolve_ticket(ticket_id, user_id=None):
+def create_tickets_bulk(ticket_dicts: list[dict]) -> list[str]:
+    """Insert many tickets in one round trip. Each dict holds create_ticket's keyword arguments."""
+    if not ticket_dicts:
+        return []
+    now = datetime.now(_UTC)  # one timestamp for the whole batch
+    docs = [_ticket_doc(**t, timestamp=now) for t in ticket_dicts]
+    result = tickets.insert_many(docs, ordered=False)
+    return [str(ticket_id) for ticket_id in result.inserted_ids]
+
+async def resolve_ticket(ticket_id, user_id=None):
     """Mark a ticket as resolved (set resolved=true)."""
     
     # Update user statistics if user_id provided
     if user_id:
-        users.update_one(
+        await async_users.update_one(
             {"_id": ObjectId(user_id)},
             {"$inc": {"points": 1}}
         )
     
     # Mark ticket as resolved
-    result = tickets.update_one(
+    result = await async_tickets.update_one(
         {"_id": ObjectId(ticket_id)},
         {"$set": {"resolved": True}}
     )
     
     return result.modified_count == 1
 
-def claim_ticket(ticket_id, user_id=None):
+async def claim_ticket(ticket_id, user_id=None):
     """Mark a ticket as claimed by a user (set claimed=true) or unclaim it."""
-    ticket = tickets.find_one({"_id": ObjectId(ticket_id)})
+    ticket = await async_tickets.find_one({"_id": ObjectId(ticket_id)})
     if ticket["claimed"] == False:
-        result = tickets.update_one(
+        result = await async_tickets.update_one(
             {"_id": ObjectId(ticket_id)},
             {"$set": {"claimed": True, "claimed_by": user_id}}
         )
         return 1
     else:
-        result = tickets.update_one(
+        result = await async_tickets.update_one(
             {"_id": ObjectId(ticket_id)},
             {"$set": {"claimed": False, "claimed_by": None}}
         )
         return 0
 
+def get_ticket_stats(top_n: int = 10, top_examples: int = 20) -> dict:
+    """
+    Summarize tickets server-side: total count, busiest locations, severity histogram
+    with the average position per severity, and the most severe ticket descriptions.
+    """
+    pipeline = [{"$facet": {
+        "top_locations": [
+            {"$group": {"_id": "$location", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": top_n},
+        ],
+        "severity_distribution": [
+            {"$match": {"severity": {"$exists": True}}},
+            {"$group": {
+                "_id": "$severity",
+                "count": {"$sum": 1},
+                "avg_lat": {"$avg": "$location.lat"},
+                "avg_lon": {"$avg": "$location.lon"},
+            }},
+            {"$sort": {"_id": -1}},
+        ],
+        "top_examples": [
+            {"$sort": {"severity": -1}},
+            {"$limit": top_examples},
+            {"$project": {"_id": 0, "description": 1, "severity": 1}},
+        ],
+        "total": [{"$count": "n"}],
+    }}]
+    result = next(tickets.aggregate(pipeline), {})
+    total = result.get("total", [])
+    severities = result.get("severity_distribution", [])
+
+    return {
+        "total_tickets": total[0]["n"] if total else 0,
+        "top_locations": [[r["_id"], r["count"]] for r in result.get("top_locations", [])],
+        "severity_distribution": {r["_id"]: r["count"] for r in severities},
+        "severity_centroids": {r["_id"]: [r["avg_lat"], r["avg_lon"]] for r in severities},
+        "top_examples": result.get("top_examples", []),
+    }
+
+# CLASSIFICATION CACHE
+CLASSIFICATION_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+def get_cached_classifications(image_hashes: list[str]) -> dict:
+    """
+    Look up cached results for many image hashes in one query.
+    Returns {hash: {"severity", "cloudinary_url" (if uploaded)}}. Best effort: {} on error.
+    """
+    if not image_hashes:
+        return {}
+    try:
+        cursor = classification_cache.find(
+            {"_id": {"$in": image_hashes}}, {"severity": 1, "cloudinary_url": 1}
+        )
+        return {doc.pop("_id"): doc for doc in cursor}
+    except PyMongoError as e:
+        print("Could not read classification cache:", e)
+        return {}
+
+def cache_severities(severities: dict):
+    """Store {image hash: severity} in one bulk write. Best effort: errors are only printed."""
+    if not severities:
+        return
+    now = datetime.now(_UTC)
+    try:
+        classification_cache.bulk_write([
+            UpdateOne({"_id": h}, {"$set": {"severity": sev, "ts": now}}, upsert=True)
+            for h, sev in severities.items()
+        ], ordered=False)
+    except PyMongoError as e:
+        print("Could not write classification cache:", e)
+
+def cache_cloudinary_url(image_hash: str, url: str):
+    """Remember where an image was uploaded so identical images can reuse the URL. Best effort."""
+    try:
+        classification_cache.update_one({"_id": image_hash}, {"$set": {"cloudinary_url": url}})
+    except PyMongoError as e:
+        print("Could not write classification cache:", e)
+
 class UserRequest(BaseModel):
     name: str
     email: str
     password: str
 
-Users = users
+Users = async_users
+
+# INDEXES
+async def ensure_indexes():
+    """
+    Check the connection and create the indexes used by hot queries (no-op if
+    they already exist). Runs once per API worker at startup.
+    """
+    try:
+        await async_client.admin.command("ping")
+        print("Connected to MongoDB!")
+    except PyMongoError as e:
+        print("Could not connect:", e)
+        return
 
-#creating a user:
-#user_id = create_user("Andrew Wang", "andrew@example.com", "password123", skills=["Python", "OpenCV"])
+    try:
+        await async_users.create_index("email", unique=True)
+        await async_tickets.create_index([
+            ("resolved", ASCENDING),
+            ("priority", DESCENDING),
+            ("timestamp", DESCENDING),
+        ])
+        # Open (or resolved) tickets, most severe first
+        await async_tickets.create_index([("resolved", ASCENDING), ("severity", DESCENDING)])
+        # Newest-first listing in GET /tickets
+        await async_tickets.create_index([("timestamp", DESCENDING)])
+        # Cached classifications expire after a week
+        await async_db["classification_cache"].create_index(
+            "ts", expireAfterSeconds=CLASSIFICATION_CACHE_TTL_SECONDS
+        )
+    except PyMongoError as e:
+        print("Could not create indexes:", e)
 
-#creating a ticket:
-#create_ticket("testurl", [4.2, -39], 10,)
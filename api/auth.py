@@ -1,10 +1,13 @@
-import os, bcrypt, time, jwt
+import os, bcrypt, time, jwt, asyncio, hmac
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
 from dotenv import load_dotenv
+from argon2.exceptions import InvalidHashError, VerificationError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from Database import users  # Mongo users collection [file:413]
+from Database import async_users_json, password_hasher, password_pool  # Mongo users collection [file:413]
+from ttl_cache import TTLCache
 
 load_dotenv()
 
@@ -13,29 +16,143 @@ if not JWT_SECRET:
     raise RuntimeError("JWT_SECRET not found")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
+ACCESS_TOKEN_TTL = 3600 * 12  # 12 hours
+# Refresh tokens let clients get new access tokens without logging in
+# (and paying for a password hash) again
+REFRESH_TOKEN_TTL = 3600 * 24 * 30  # 30 days
+
+# Key material prepared once; PyJWT re-encodes str keys on every call
+_JWT_KEY = JWT_SECRET.encode("utf-8")
+_JWT_ALGORITHMS = [JWT_ALGORITHM]
+
 security = HTTPBearer()
 
+# Recently verified (password, hash) pairs, keyed by an HMAC so no plain password is kept
+_verified_passwords = TTLCache(maxsize=10_000, ttl=60)
+
+# Sanitized user docs by user_id, so authenticated requests skip the Mongo lookup
+_user_cache = TTLCache(maxsize=10_000, ttl=30)
+
+
+# Hashes created before the argon2 migration
+_BCRYPT_PREFIXES = (b"$2a$", b"$2b$", b"$2y$")
 
-def verify_password(plain_password: str, hashed_password: bytes) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password)
+
+def _is_bcrypt_hash(hashed_password: bytes | str) -> bool:
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode("utf-8")
+    return hashed_password.startswith(_BCRYPT_PREFIXES)
+
+
+def _check_password(plain_password: str, hashed_password: bytes | str) -> bool:
+    if _is_bcrypt_hash(hashed_password):
+        if isinstance(hashed_password, str):
+            hashed_password = hashed_password.encode("utf-8")
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password)
+
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode("utf-8")
+    try:
+        return password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def _verification_key(plain_password: str, hashed_password: bytes | str) -> bytes:
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode("utf-8")
+    message = plain_password.encode("utf-8") + b"\0" + hashed_password
+    return hmac.new(_JWT_KEY, message, "sha256").digest()
+
+
+async def verify_password(plain_password: str, hashed_password: bytes | str) -> bool:
+    key = _verification_key(plain_password, hashed_password)
+    if _verified_passwords.get(key):
+        return True
+
+    loop = asyncio.get_running_loop()
+    ok = await loop.run_in_executor(
+        password_pool,
+        _check_password,
+        plain_password,
+        hashed_password,
+    )
+    if ok:
+        _verified_passwords.set(key, True)
+    return ok
+
+
+def password_needs_rehash(hashed_password: bytes | str) -> bool:
+    """True for legacy bcrypt hashes or argon2 hashes with outdated parameters."""
+    if _is_bcrypt_hash(hashed_password):
+        return True
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode("utf-8")
+    return password_hasher.check_needs_rehash(hashed_password)
 
 
 def create_access_token(user_id: str) -> str:
     """user_id is str(user['_id'])."""
     payload = {
         "user_id": user_id,
-        "exp": time.time() + 3600 * 12,  # 12 hours
+        "exp": time.time() + ACCESS_TOKEN_TTL,
     }
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = jwt.encode(payload, _JWT_KEY, algorithm=JWT_ALGORITHM)
     return token
 
 
-def get_current_user(
+def create_refresh_token(user_id: str) -> str:
+    payload = {
+        "user_id": user_id,
+        "type": "refresh",
+        "exp": time.time() + REFRESH_TOKEN_TTL,
+    }
+    return jwt.encode(payload, _JWT_KEY, algorithm=JWT_ALGORITHM)
+
+
+def verify_refresh_token(token: str) -> str:
+    """Returns the user_id of a valid refresh token (signature check only, no password hashing)."""
+    try:
+        data = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+        )
+    user_id = data.get("user_id")
+    if data.get("type") != "refresh" or not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    return user_id
+
+
+async def _load_user(user_id: str) -> dict | None:
+    user = _user_cache.get(user_id)
+    if user is None:
+        try:
+            oid = ObjectId(user_id)
+        except (InvalidId, TypeError):
+            return None
+
+        # Look up by _id using ObjectId
+        user = await async_users_json.find_one({"_id": oid}, projection={"password_hash": 0})
+        if not user:
+            return None
+
+        _user_cache.set(user_id, user)
+    return dict(user)
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop a cached user doc after the user record changes."""
+    _user_cache.pop(user_id, None)
+
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
     token = credentials.credentials
     try:
-        data = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        data = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS)
         user_id = data.get("user_id")
     except Exception:
         raise HTTPException(
@@ -43,14 +160,11 @@ def get_current_user(
             detail="Invalid or expired token",
         )
 
-    if not user_id:
+    # Refresh tokens are only accepted by /refresh
+    if not user_id or data.get("type") == "refresh":
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
-    # Look up by _id using ObjectId
-    user = users.find_one({"_id": ObjectId(user_id)})
+    user = await _load_user(user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-
-    user["_id"] = str(user["_id"])
-    user.pop("password_hash", None)
     return user
\ No newline at end of file
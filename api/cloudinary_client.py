@@ -0,0 +1,90 @@
+"""
+Shared Cloudinary configuration.
+
+get_cloudinary() configures the SDK from CLOUDINARY_URL on first use, with a
+larger keep-alive pool for its uploader, and returns the configured module;
+later calls skip the setup entirely.
+upload_image_async() uploads through the REST API for async endpoints.
+"""
+
+import os
+import re
+import time
+import functools
+from typing import BinaryIO
+from dotenv import load_dotenv
+import httpx
+import cloudinary
+import cloudinary.utils
+import cloudinary.uploader
+import cloudinary.exceptions
+from resilience import transient_retry
+
+_CLOUDINARY_URL_RE = re.compile(r"cloudinary://([^:]+):([^@]+)@(.+)")
+
+# Keep-alive connections the SDK may hold to Cloudinary. Its default pool keeps
+# one, so concurrent uploads (pipeline workers, API threads) redo TCP+TLS each time.
+UPLOAD_POOL_SIZE = 20
+
+
+@functools.lru_cache(maxsize=1)
+def get_cloudinary():
+    load_dotenv()
+    cloudinary_url = os.getenv("CLOUDINARY_URL")
+    if not cloudinary_url:
+        raise ValueError("CLOUDINARY_URL not found in environment variables")
+
+    # Parse cloudinary:// URL format manually
+    match = _CLOUDINARY_URL_RE.match(cloudinary_url)
+    if match:
+        api_key, api_secret, cloud_name = match.groups()
+        cloudinary.config(api_key=api_key, api_secret=api_secret, cloud_name=cloud_name)
+    else:
+        cloudinary.config(cloudinary_url=cloudinary_url)
+
+    cloudinary.uploader._http = cloudinary.utils.get_http_connector(
+        cloudinary.config(), {**cloudinary.CERT_KWARGS, "maxsize": UPLOAD_POOL_SIZE}
+    )
+    return cloudinary
+
+
+@functools.lru_cache(maxsize=1)
+def _get_async_client() -> httpx.AsyncClient:
+    # One pooled client for the process, so uploads reuse connections to Cloudinary
+    return httpx.AsyncClient(
+        timeout=60,
+        limits=httpx.Limits(max_keepalive_connections=UPLOAD_POOL_SIZE),
+    )
+
+
+@transient_retry
+async def upload_image_async(file: bytes | BinaryIO, folder: str = "streetsweep") -> dict:
+    """
+    Signed image upload via Cloudinary's REST API on the event loop
+    (the SDK's uploader blocks). Returns the upload response, like uploader.upload.
+    Network failures and 5xx responses are retried like the SDK path's.
+    """
+    config = get_cloudinary().config()
+    params = {"folder": folder, "timestamp": str(int(time.time()))}
+    params["signature"] = cloudinary.utils.api_sign_request(
+        params, config.api_secret, config.signature_algorithm or "sha1"
+    )
+    params["api_key"] = config.api_key
+
+    response = await _get_async_client().post(
+        cloudinary.utils.cloudinary_api_url("upload", resource_type="image"),
+        data=params,
+        files={"file": ("file", file)},
+    )
+    # Proxies answer 502/504 with HTML; "Unexpected error" is what is_transient retries
+    if response.status_code >= 500:
+        raise cloudinary.exceptions.Error(f"Unexpected error - HTTP {response.status_code} from Cloudinary")
+    try:
+        result = response.json()
+    except ValueError:
+        raise cloudinary.exceptions.Error(
+            f"Error parsing server response (HTTP {response.status_code})"
+        )
+    if "error" in result:
+        raise cloudinary.exceptions.Error(result["error"]["message"])
+    return result
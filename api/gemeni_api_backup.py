@@ -1,11 +1,14 @@
 import io
 import os
-import json
-import base64
+import re
+import pybase64
+import orjson
 from dotenv import load_dotenv
 from collections import Counter
 from PIL import Image
 import requests  # for OpenRouter HTTP calls
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 load_dotenv()
@@ -17,6 +20,17 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 MODEL_NAME = "google/gemini-2.0-flash-001"
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# Shared session so calls reuse the TLS connection to openrouter.ai
+_session = requests.Session()
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    ),
+)
+
 
 def _openrouter_chat(messages, max_tokens: int | None = None) -> str:
     """
@@ -35,9 +49,9 @@ def _openrouter_chat(messages, max_tokens: int | None = None) -> str:
     if max_tokens is not None:
         payload["max_tokens"] = max_tokens
 
-    resp = requests.post(OPENROUTER_URL, headers=headers, json=payload, timeout=60)
+    resp = _session.post(OPENROUTER_URL, headers=headers, data=orjson.dumps(payload), timeout=60)
     resp.raise_for_status()
-    data = resp.json()
+    data = orjson.loads(resp.content)
     return data["choices"][0]["message"]["content"].strip()
 
 
@@ -45,11 +59,14 @@ def _openrouter_chat(messages, max_tokens: int | None = None) -> str:
 
 
 def optimize_image(image_bytes: bytes, max_size: int = 1024) -> bytes:
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
     w, h = img.size
     scale = min(1.0, max_size / max(w, h))
     if scale < 1.0:
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+        # BOX is area averaging (cv2.INTER_AREA), ~4x faster than LANCZOS for downscaling
+        img = img.resize((int(w * scale), int(h * scale)), Image.BOX)
     buf = io.BytesIO()
     img.save(buf, format="JPEG", quality=80, optimize=True)
     return buf.getvalue()
@@ -57,16 +74,10 @@ def optimize_image(image_bytes: bytes, max_size: int = 1024) -> bytes:
 
 # --- Classification ---
 
+# First number in a non-JSON reply, e.g. "Severity: 7/10" -> 7
+_SEVERITY_RE = re.compile(r"\d+")
 
-def classify_image(image_bytes: bytes) -> dict:
-    """
-    Classify trash severity in an image using Gemini via OpenRouter.
-    Returns: {"severity": int | None, "image_base64": str}
-    """
-    # Keep this in case you later wire image support through OpenRouter
-    _ = optimize_image(image_bytes)
-
-    prompt = """
+CLASSIFY_PROMPT = """
 You are a city cleanliness inspector.
 Estimate how much visible trash/litter is present in a CCTV frame.
 Return ONLY a JSON object with one key:
@@ -77,20 +88,25 @@ Example:
 {"severity": 7}
 """
 
-    text = _openrouter_chat(
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=64,
-    )
+# Built once; the prompt is the same for every call
+_CLASSIFY_MESSAGES = [{"role": "user", "content": CLASSIFY_PROMPT}]
+
+
+def classify_image(image_bytes: bytes) -> dict:
+    """
+    Classify trash severity in an image using Gemini via OpenRouter.
+    Returns: {"severity": int | None, "image_base64": str}
+    """
+    text = _openrouter_chat(messages=_CLASSIFY_MESSAGES, max_tokens=64)
 
     text = text.strip()
     try:
-        data = json.loads(text)
+        data = orjson.loads(text)
     except Exception:
-        digits = [c for c in text if c.isdigit()]
-        sev = int("".join(digits)) if digits else None
-        data = {"severity": sev}
+        match = _SEVERITY_RE.search(text)
+        data = {"severity": int(match.group()) if match else None}
 
-    image_b64 = base64.b64encode(image_bytes).decode("utf-8")
+    image_b64 = pybase64.b64encode_as_string(image_bytes)
     return {
         "severity": data.get("severity"),
         "image_base64": image_b64,
@@ -99,21 +115,7 @@ Example:
 
 # --- Before / after comparison ---
 
-
-def compare_image(before_bytes: bytes, after_bytes: bytes) -> dict:
-    """
-    Compare two images (before and after) to verify cleanup.
-
-    Returns:
-        {
-            "same_location": bool | None,
-            "cleanup_successful": bool | None,
-        }
-    """
-    _ = optimize_image(before_bytes)
-    _ = optimize_image(after_bytes)
-
-    prompt = """
+COMPARE_PROMPT = """
 You are a city cleanliness inspector.
 
 You are given TWO photos:
@@ -137,14 +139,24 @@ Example:
 }
 """
 
-    text = _openrouter_chat(
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=128,
-    )
+_COMPARE_MESSAGES = [{"role": "user", "content": COMPARE_PROMPT}]
+
+
+def compare_image(before_bytes: bytes, after_bytes: bytes) -> dict:
+    """
+    Compare two images (before and after) to verify cleanup.
+
+    Returns:
+        {
+            "same_location": bool | None,
+            "cleanup_successful": bool | None,
+        }
+    """
+    text = _openrouter_chat(messages=_COMPARE_MESSAGES, max_tokens=128)
 
     text = text.strip()
     try:
-        data = json.loads(text)
+        data = orjson.loads(text)
     except Exception:
         lower = text.lower()
         same = "same location" in lower or "same place" in lower
@@ -163,25 +175,38 @@ Example:
 # --- Ticket insights ---
 
 
-def generate_insight(tickets: list[dict]) -> str:
+def summarize_tickets(tickets) -> dict:
     """
-    Generate insights from ticket data using Gemini (via OpenRouter).
-    Returns a text summary.
+    Build the insight summary from ticket dicts in Python.
+    Database.get_ticket_stats() computes the same summary server-side.
     """
-    locations = [tuple(t["location"]) for t in tickets]
-    severities = [t["severity"] for t in tickets if "severity" in t]
-
-    loc_counts = Counter(locations)
-    severity_dist = Counter(severities)
+    # Single pass over the tickets, updating both counters
+    total = 0
+    loc_counts = Counter()
+    severity_dist = Counter()
+    for t in tickets:
+        total += 1
+        loc = t["location"]
+        # Tickets store {"lat", "lon"}; tuple(dict) would only keep the keys
+        loc_counts[tuple(loc.values()) if isinstance(loc, dict) else tuple(loc)] += 1
+        if "severity" in t:
+            severity_dist[t["severity"]] += 1
 
-    prompt_data = {
-        "total_tickets": len(tickets),
+    return {
+        "total_tickets": total,
         "top_locations": loc_counts.most_common(10),
         "severity_distribution": severity_dist,
     }
+
+def generate_insight(summary: dict) -> str:
+    """
+    Generate insights from a ticket summary using Gemini (via OpenRouter).
+    summary: {"total_tickets", "top_locations", "severity_distribution", ...}
+    Returns a text summary.
+    """
     prompt = (
         "You are a municipal waste planning assistant.\n"
-        f"Data summary: {json.dumps(prompt_data)}\n\n"
+        f"Data summary: {orjson.dumps(summary, option=orjson.OPT_NON_STR_KEYS).decode()}\n\n"
         "Explain:\n"
         "1) Key problem areas and trends.\n"
         "2) Operational improvements (routing, frequency, scheduling).\n"
@@ -196,7 +221,14 @@ def generate_insight(tickets: list[dict]) -> str:
     return text.strip()
 
 
+# (st_mtime_ns, content) of the last insight.txt read
+_INSIGHT_CACHE: tuple[int, str] | None = None
+
+
 def get_insight() -> str:
-    with open("insight.txt", "r", encoding="utf-8") as f:
-        content = f.read()
-    return content
+    global _INSIGHT_CACHE
+    mtime = os.stat("insight.txt").st_mtime_ns
+    if _INSIGHT_CACHE is None or _INSIGHT_CACHE[0] != mtime:
+        with open("insight.txt", "r", encoding="utf-8") as f:
+            _INSIGHT_CACHE = (mtime, f.read())
+    return _INSIGHT_CACHE[1]
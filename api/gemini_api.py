@@ -1,36 +1,49 @@
+import asyncio
+import httpx
 from google import genai
 from google.genai import types
-from PIL import Image
-import io, os, json, base64, json
+import os, re
+import orjson
+import pybase64
 from dotenv import load_dotenv
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+from resilience import transient_retry
+from image_utils import optimize_image
 
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
-client = genai.Client(api_key=GEMINI_API_KEY)
 MODEL_NAME = "gemini-2.5-flash"
 
+# Concurrent Gemini requests for batch classification
+CLASSIFY_CONCURRENCY = 16
+_classify_pool = ThreadPoolExecutor(max_workers=CLASSIFY_CONCURRENCY)
 
-def optimize_image(image_bytes: bytes, max_size: int = 1024) -> bytes:
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    w, h = img.size
-    scale = min(1.0, max_size / max(w, h))
-    if scale < 1.0:
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=80, optimize=True)
-    return buf.getvalue()
+# One shared client for the process. Its httpx pools keep a connection per
+# batch thread alive, and for a minute rather than httpx's 5s, so sparse
+# /classify calls skip the TLS handshake too. The async pool only applies when
+# client.aio runs on httpx; google-genai releases that prefer aiohttp when it
+# is installed drop the httpx-only "limits" argument.
+_HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=4 * CLASSIFY_CONCURRENCY,
+    max_keepalive_connections=2 * CLASSIFY_CONCURRENCY,
+    keepalive_expiry=60,
+)
+client = genai.Client(
+    api_key=GEMINI_API_KEY,
+    http_options=types.HttpOptions(
+        client_args={"limits": _HTTP_POOL_LIMITS},
+        async_client_args={"limits": _HTTP_POOL_LIMITS},
+    ),
+)
 
+# Concurrent Gemini requests from the API's event loop; later calls wait for a slot
+GEMINI_ASYNC_CONCURRENCY = 8
+_gemini_semaphore = asyncio.Semaphore(GEMINI_ASYNC_CONCURRENCY)
 
-def classify_image(image_bytes: bytes) -> dict:
-    """
-    Classify trash severity in an image using Gemini.
-    Returns: {"severity": int | None, "image_base64": str}
-    """
-    optimized = optimize_image(image_bytes)
-
-    prompt = """
+CLASSIFY_PROMPT = """
     You are a city cleanliness inspector.
     Given this single CCTV frame, estimate how much visible trash/litter is present.
     Return ONLY a JSON object with one key:
@@ -40,41 +53,7 @@ def classify_image(image_bytes: bytes) -> dict:
     {"severity": 7}
     """
 
-    image_part = types.Part.from_bytes(data=optimized, mime_type="image/jpeg")
-    resp = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=[prompt, image_part],
-    )
-
-    text = resp.text.strip()
-    try:
-        data = json.loads(text)
-    except Exception:
-        digits = [c for c in text if c.isdigit()]
-        sev = int("".join(digits)) if digits else None
-        data = {"severity": sev}
-
-    image_b64 = base64.b64encode(image_bytes).decode("utf-8")
-    return {
-        "severity": data.get("severity"),
-        "image_base64": image_b64,
-    }
-
-def compare_image(before_bytes: bytes, after_bytes: bytes) -> dict:
-    """
-    Compare two images (before and after) to verify cleanup.
-
-    Returns:
-        {
-            "same_location": bool | None,
-            "cleanup_successful": bool | None,
-        }
-    """
-    # Optionally reuse optimize_image to shrink for token savings
-    before_opt = optimize_image(before_bytes)
-    after_opt = optimize_image(after_bytes)
-
-    prompt = """
+COMPARE_PROMPT = """
     You are a city cleanliness inspector.
 
     You are given TWO photos:
@@ -98,19 +77,159 @@ def compare_image(before_bytes: bytes, after_bytes: bytes) -> dict:
     }
     """
 
+# Static request pieces, built once. The response schemas make Gemini return
+# valid JSON in exactly this shape (the text fallbacks below are a safety net).
+_CLASSIFY_PROMPT_PART = types.Part.from_text(text=CLASSIFY_PROMPT)
+_COMPARE_PROMPT_PART = types.Part.from_text(text=COMPARE_PROMPT)
+_CLASSIFY_CONFIG = types.GenerateContentConfig(
+    response_mime_type="application/json",
+    response_schema=types.Schema(
+        type=types.Type.OBJECT,
+        properties={"severity": types.Schema(type=types.Type.INTEGER, minimum=1, maximum=10)},
+        required=["severity"],
+    ),
+)
+_COMPARE_CONFIG = types.GenerateContentConfig(
+    response_mime_type="application/json",
+    response_schema=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "same_location": types.Schema(type=types.Type.BOOLEAN),
+            "cleanup_successful": types.Schema(type=types.Type.BOOLEAN),
+        },
+        required=["same_location", "cleanup_successful"],
+    ),
+)
+
+
+# First number in a non-JSON reply, e.g. "Severity: 7/10" -> 7
+_SEVERITY_RE = re.compile(r"\d+")
+
+
+def _parse_classification(text: str) -> dict:
+    text = text.strip()
+    try:
+        return orjson.loads(text)
+    except Exception:
+        match = _SEVERITY_RE.search(text)
+        return {"severity": int(match.group()) if match else None}
+
+
+@transient_retry
+def classify_image(image_bytes: bytes | BinaryIO, include_base64: bool = False, optimize: bool = True) -> dict:
+    """
+    Classify trash severity in an image (bytes or a binary file) using Gemini.
+    Returns: {"severity": int | None, "image_base64": str | None}
+    image_base64 is only encoded when include_base64 is set (/classify returns a
+    Cloudinary URL instead, so nothing needs it by default).
+    Pass optimize=False for images that were already shrunk with optimize_image().
+    """
+    optimized = optimize_image(image_bytes) if optimize else image_bytes
+
+    image_part = types.Part.from_bytes(data=optimized, mime_type="image/jpeg")
+    resp = client.models.generate_content(
+        model=MODEL_NAME,
+        contents=[_CLASSIFY_PROMPT_PART, image_part],
+        config=_CLASSIFY_CONFIG,
+    )
+
+    data = _parse_classification(resp.text)
+
+    image_b64 = None
+    if include_base64:
+        if not isinstance(image_bytes, (bytes, bytearray, memoryview)):
+            image_bytes.seek(0)
+            image_bytes = image_bytes.read()
+        image_b64 = pybase64.b64encode_as_string(image_bytes)
+    return {
+        "severity": data.get("severity"),
+        "image_base64": image_b64,
+    }
+
+@transient_retry
+async def classify_image_async(optimized: bytes) -> dict:
+    """
+    classify_image() for the event loop, using the SDK's async client and at most
+    GEMINI_ASYNC_CONCURRENCY requests in flight. Takes an image already shrunk
+    with optimize_image(). Returns: {"severity": int | None}
+    """
+    image_part = types.Part.from_bytes(data=optimized, mime_type="image/jpeg")
+    async with _gemini_semaphore:
+        resp = await client.aio.models.generate_content(
+            model=MODEL_NAME,
+            contents=[_CLASSIFY_PROMPT_PART, image_part],
+            config=_CLASSIFY_CONFIG,
+        )
+    return {"severity": _parse_classification(resp.text).get("severity")}
+
+def classify_images_batch(images: list[bytes], include_base64: bool = False, optimize: bool = True) -> list:
+    """
+    Classify many images with up to CLASSIFY_CONCURRENCY requests in flight.
+    Returns one classify_image() result per image, in order, or the
+    exception raised for that image.
+    """
+    futures = [
+        _classify_pool.submit(classify_image, image_bytes, include_base64, optimize)
+        for image_bytes in images
+    ]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+def compare_image(before_bytes: bytes | BinaryIO, after_bytes: bytes | BinaryIO, optimize: bool = True) -> dict:
+    """
+    Compare two images (before and after, as bytes or binary files) to verify cleanup.
+    Pass optimize=False for images that were already shrunk with optimize_image().
+
+    Returns:
+        {
+            "same_location": bool | None,
+            "cleanup_successful": bool | None,
+        }
+    """
+    # Optionally reuse optimize_image to shrink for token savings
+    before_opt = optimize_image(before_bytes) if optimize else before_bytes
+    after_opt = optimize_image(after_bytes) if optimize else after_bytes
+
     before_part = types.Part.from_bytes(data=before_opt, mime_type="image/jpeg")
     after_part = types.Part.from_bytes(data=after_opt, mime_type="image/jpeg")
 
     resp = client.models.generate_content(
         model=MODEL_NAME,
-        contents=[prompt, before_part, after_part],
+        contents=[_COMPARE_PROMPT_PART, before_part, after_part],
+        config=_COMPARE_CONFIG,
     )
 
-    print("Gemini compare response:", resp.text)
+    return _parse_comparison(resp.text)
+
+@transient_retry
+async def compare_image_async(before_opt: bytes, after_opt: bytes) -> dict:
+    """
+    compare_image() for the event loop, for images already shrunk with optimize_image().
+    Shares the GEMINI_ASYNC_CONCURRENCY limit with classify_image_async().
+    """
+    before_part = types.Part.from_bytes(data=before_opt, mime_type="image/jpeg")
+    after_part = types.Part.from_bytes(data=after_opt, mime_type="image/jpeg")
+
+    async with _gemini_semaphore:
+        resp = await client.aio.models.generate_content(
+            model=MODEL_NAME,
+            contents=[_COMPARE_PROMPT_PART, before_part, after_part],
+            config=_COMPARE_CONFIG,
+        )
+
+    return _parse_comparison(resp.text)
 
-    text = resp.text.strip()
+def _parse_comparison(text: str) -> dict:
+    print("Gemini compare response:", text)
+
+    text = text.strip()
     try:
-        data = json.loads(text)
+        data = orjson.loads(text)
     except Exception:
         # Very defensive fallback: try to guess booleans/score from text
         lower = text.lower()
@@ -126,25 +245,38 @@ def compare_image(before_bytes: bytes, after_bytes: bytes) -> dict:
         "cleanup_successful": data.get("cleanup_successful"),
     }
 
-def generate_insight(tickets: list[dict]) -> str:
+def summarize_tickets(tickets) -> dict:
     """
-    Generate insights from ticket data using Gemini.
-    Returns a text summary.
+    Build the insight summary from ticket dicts in Python.
+    Database.get_ticket_stats() computes the same summary server-side.
     """
-    locations = [tuple(t["location"]) for t in tickets]
-    severities = [t["severity"] for t in tickets if "severity" in t]
-
-    loc_counts = Counter(locations)
-    severity_dist = Counter(severities)
+    # Single pass over the tickets, updating both counters
+    total = 0
+    loc_counts = Counter()
+    severity_dist = Counter()
+    for t in tickets:
+        total += 1
+        loc = t["location"]
+        # Tickets store {"lat", "lon"}; tuple(dict) would only keep the keys
+        loc_counts[tuple(loc.values()) if isinstance(loc, dict) else tuple(loc)] += 1
+        if "severity" in t:
+            severity_dist[t["severity"]] += 1
 
-    prompt_data = {
-        "total_tickets": len(tickets),
+    return {
+        "total_tickets": total,
         "top_locations": loc_counts.most_common(10),
         "severity_distribution": severity_dist,
     }
+
+def generate_insight(summary: dict) -> str:
+    """
+    Generate insights from a ticket summary using Gemini.
+    summary: {"total_tickets", "top_locations", "severity_distribution", ...}
+    Returns a text summary.
+    """
     prompt = (
         "You are a municipal waste planning assistant.\n"
-        f"Data summary: {json.dumps(prompt_data)}\n\n"
+        f"Data summary: {orjson.dumps(summary, option=orjson.OPT_NON_STR_KEYS).decode()}\n\n"
         "Explain:\n"
         "1) Key problem areas and trends.\n"
         "2) Operational improvements (routing, frequency, scheduling).\n"
@@ -159,7 +291,14 @@ def generate_insight(tickets: list[dict]) -> str:
 
     return resp.text.strip()
 
+# (st_mtime_ns, content) of the last insight.txt read
+_INSIGHT_CACHE: tuple[int, str] | None = None
+
+
 def get_insight() -> str:
-    with open("insight.txt", "r", encoding="utf-8") as f:
-        content = f.read()
-    return content
\ No newline at end of file
+    global _INSIGHT_CACHE
+    mtime = os.stat("insight.txt").st_mtime_ns
+    if _INSIGHT_CACHE is None or _INSIGHT_CACHE[0] != mtime:
+        with open("insight.txt", "r", encoding="utf-8") as f:
+            _INSIGHT_CACHE = (mtime, f.read())
+    return _INSIGHT_CACHE[1]
\ No newline at end of file
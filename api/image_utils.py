@@ -0,0 +1,68 @@
+"""
+Image shrinking for Gemini requests.
+
+Kept free of import-time side effects (no clients, no network), so the API's
+spawned image workers only load Pillow and pyvips.
+"""
+
+import io
+from typing import BinaryIO
+from PIL import Image
+
+try:
+    import pyvips  # libvips: shrink-on-load and streaming resize/encode, Pillow is the fallback
+except (ImportError, OSError):  # OSError: pyvips installed without the libvips library
+    pyvips = None
+
+
+def _open_image(image: bytes | BinaryIO) -> Image.Image:
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(image))
+    # File-like (e.g. an UploadFile's spooled file): PIL reads it as it decodes
+    image.seek(0)
+    return Image.open(image)
+
+
+def _read_bytes(image: bytes | BinaryIO) -> bytes:
+    if isinstance(image, bytes):
+        return image
+    if isinstance(image, (bytearray, memoryview)):
+        return bytes(image)
+    image.seek(0)
+    return image.read()
+
+
+def _optimize_image_vips(image: bytes | BinaryIO, max_size: int, quality: int) -> bytes:
+    image = _read_bytes(image)
+    # thumbnail decodes at reduced size where the format allows (JPEG shrink-on-load)
+    img = pyvips.Image.thumbnail_buffer(image, max_size, height=max_size, size="down")
+    if img.hasalpha():
+        img = img.flatten()
+    if img.interpretation != "srgb":
+        img = img.colourspace("srgb")
+    return img.jpegsave_buffer(Q=quality, optimize_coding=True, strip=True)
+
+
+def optimize_image(image_bytes: bytes | BinaryIO, max_size: int = 1024, quality: int = 80) -> bytes:
+    # Image.open only parses the header; pixels are decoded on first use
+    img = _open_image(image_bytes)
+    if img.format == "JPEG" and img.mode in ("RGB", "L") and max(img.size) <= max_size:
+        # Already a small JPEG: a decode + re-encode would cost tens of ms and save nothing
+        return _read_bytes(image_bytes)
+
+    if pyvips is not None:
+        return _optimize_image_vips(image_bytes, max_size, quality)
+
+    # For JPEGs, have libjpeg scale by 1/2, 1/4 or 1/8 in the DCT domain while
+    # decoding (never below max_size), so the resize below works on fewer pixels
+    img.draft("RGB", (max_size, max_size))
+    if img.mode != "RGB":
+        img = img.convert("RGB")  # convert() copies the buffer even when the mode already matches
+    w, h = img.size
+    scale = min(1.0, max_size / max(w, h))
+    if scale < 1.0:
+        # BOX is area averaging (cv2.INTER_AREA), ~4x faster than LANCZOS for downscaling
+        img = img.resize((int(w * scale), int(h * scale)), Image.BOX)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
@@ -1,10 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-from users import router as users_router
-from tickets import router as tickets_router
-
-app = FastAPI()
+# orjson encodes responses (e.g. the GET /tickets listing) much faster than stdlib json
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Configure CORS - allow specific origins (no wildcard with credentials)
 origins = [
@@ -24,10 +23,29 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-app.include_router(users_router)
-app.include_router(tickets_router)
+# `python main.py` only starts the server; uvicorn then imports this module again
+# as "main" to build the app. Image workers spawned from that process re-run
+# this file as "__mp_main__" and don't need the routers (or their Mongo and
+# Gemini clients) either.
+if __name__ not in ("__main__", "__mp_main__"):
+    from users import router as users_router
+    from tickets import router as tickets_router
+
+    app.include_router(users_router)
+    app.include_router(tickets_router)
 
 if __name__ == "__main__":
     import uvicorn
     import os
-    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
\ No newline at end of file
+    # Production entry point (railway.toml). One worker process unless
+    # WEB_CONCURRENCY asks for more; workers read it to size their own pools.
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", 8000)),
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+    )
\ No newline at end of file
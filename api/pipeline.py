@@ -10,41 +10,71 @@ sources and ticket creation logic for demos and testing.
 """
 
 import os
-import io
-import json
-import time
-import base64
+import asyncio
+import queue
+import hashlib
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Iterator, Optional, Callable
 from dotenv import load_dotenv
-import requests
+import aiohttp
 
-import cloudinary
-import cloudinary.uploader
-
-from gemini_api import classify_image, generate_insight
-from Database import create_ticket, tickets
+from gemini_api import CLASSIFY_CONCURRENCY, classify_images_batch, generate_insight, summarize_tickets
+from image_utils import optimize_image
+from Database import (
+    tickets, create_tickets_bulk, get_ticket_stats,
+    get_cached_classifications, cache_severities, cache_cloudinary_url
+)
+from cloudinary_client import get_cloudinary
+from resilience import CircuitBreaker, CircuitOpen, transient_retry
+from toronto_cameras import CameraMeta, load_cameras, load_image_state, save_image_state
 
 load_dotenv()
 
-# Configure Cloudinary
-cloudinary.config(cloudinary_url=os.getenv("CLOUDINARY_URL"))
+
+@transient_retry
+def _upload(file, **options):
+    """Cloudinary upload that retries transient network failures with exponential backoff."""
+    return get_cloudinary().uploader.upload(file, **options)
+
+
+# Images are shrunk to this size/quality for classification; the original is uploaded
+CLASSIFY_MAX_SIZE = 640
+CLASSIFY_QUALITY = 60
 
 # ==================== IMAGE SOURCE ADAPTERS ====================
 
 class ImageSource:
     """Base class for image sources."""
     
-    def get_images(self) -> List[Dict[str, Any]]:
+    def iter_images(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
         """
-        Returns list of image metadata dictionaries with keys:
+        Yields image metadata dictionaries one at a time (at most `limit`) with keys:
         - 'id': unique identifier for the image
         - 'name': human-readable name/location
         - 'image_bytes': raw image bytes
+        - 'path': optional local file path (uploaded directly instead of the bytes)
         - 'latitude': optional latitude coordinate
         - 'longitude': optional longitude coordinate
+        - 'state': optional source bookkeeping, recorded by mark_done()
         """
         raise NotImplementedError
+    
+    def get_images(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Returns all images from iter_images() as a list."""
+        return list(self.iter_images(limit))
+    
+    def mark_done(self, image: Dict[str, Any]):
+        """Called once an image has been fully handled (skipped or ticketed)."""
+    
+    def save_state(self):
+        """Persists what mark_done() recorded. Called at the end of every run."""
+
+
+# Marks the end of the download queue
+_DONE = object()
 
 
 class TorontoCCTVSource(ImageSource):
@@ -53,66 +83,157 @@ class TorontoCCTVSource(ImageSource):
     def __init__(
         self, 
         camera_json_url: str = "https://opendata.toronto.ca/transportation/tmc/rescucameraimages/Data/tmcearthcameras.json",
-        image_url_template: str = "https://opendata.toronto.ca/transportation/tmc/rescucameraimages/CameraImages/loc{number}.jpg"
+        image_url_template: str = "https://opendata.toronto.ca/transportation/tmc/rescucameraimages/CameraImages/loc{number}.jpg",
+        max_concurrency: int = 32,
+        skip_unchanged: bool = True
     ):
         self.camera_json_url = camera_json_url
         self.image_url_template = image_url_template
+        self.max_concurrency = max_concurrency
+        self.skip_unchanged = skip_unchanged
+        # Camera number -> {"last_modified", "sha256"} (see toronto_cameras), for
+        # images that were fully handled. A camera whose classification, upload or
+        # ticket failed keeps its old entry, so the next run retries it.
+        # None until iter_images() loads it, so a run that never got that far
+        # doesn't overwrite the saved state
+        self._seen = None
+    
+    async def _fetch(self, session: aiohttp.ClientSession, camera: CameraMeta) -> tuple:
+        """
+        Downloads one camera image. Returns (bytes, state), with bytes None if the
+        image is unchanged since the last run; state is the {"last_modified",
+        "sha256"} entry to record once the image is handled (None when not tracking).
+        """
+        number = camera["number"]
+        image_url = self.image_url_template.format(number=number)
+        
+        if not self.skip_unchanged:
+            async with session.get(image_url) as response:
+                response.raise_for_status()
+                return await response.read(), None
+        
+        # A conditional request lets the server answer 304 without sending the image
+        seen = self._seen.get(number, {})
+        headers = {"If-Modified-Since": seen["last_modified"]} if seen.get("last_modified") else None
+        async with session.get(image_url, headers=headers) as response:
+            if response.status == 304:
+                return None, None
+            response.raise_for_status()
+            image_bytes = await response.read()
+            last_modified = response.headers.get("Last-Modified")
+        
+        # Servers that ignore If-Modified-Since still resend identical bytes
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        state = {"last_modified": last_modified, "sha256": digest}
+        if digest == seen.get("sha256"):
+            return None, state
+        return image_bytes, state
+    
+    async def _fetch_result(self, session: aiohttp.ClientSession, camera: CameraMeta) -> tuple:
+        """Returns (camera, (bytes, state)) or (camera, the exception raised while downloading)."""
+        try:
+            return camera, await self._fetch(session, camera)
+        except Exception as e:
+            return camera, e
+    
+    @staticmethod
+    def _put(results: queue.Queue, item, stop: threading.Event) -> bool:
+        """Blocking put that gives up once the consumer has stopped reading."""
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
     
-    def get_images(self) -> List[Dict[str, Any]]:
-        """Fetches camera data and downloads images."""
+    async def _download(self, cameras: List[CameraMeta], results: queue.Queue, stop: threading.Event):
+        """Downloads camera images concurrently, queueing each one as soon as it arrives."""
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        # Per-socket timeouts, so time spent waiting for a pooled connection doesn't count
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=10)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                tasks = [asyncio.ensure_future(self._fetch_result(session, camera)) for camera in cameras]
+                try:
+                    for next_done in asyncio.as_completed(tasks):
+                        item = await next_done
+                        # The queue is bounded, so a slow consumer pauses the downloads
+                        if not await asyncio.to_thread(self._put, results, item, stop):
+                            break
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self._put(results, _DONE, stop)
+    
+    def iter_images(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Fetches camera data and yields images in the order their downloads finish."""
         print(f"Fetching camera list from {self.camera_json_url}")
         
         try:
-            # Fetch camera metadata
-            response = requests.get(self.camera_json_url, timeout=30)
-            response.raise_for_status()
-            
-            # The JSON is wrapped in a callback, extract the actual JSON
-            json_text = response.text
-            if json_text.startswith("jsonTMCEarthCamerasCallback("):
-                json_text = json_text[len("jsonTMCEarthCamerasCallback("):-2]
-            
-            data = json.loads(json_text)
-            cameras = data.get("Data", [])
-            
-            # Sort by Number parameter
-            cameras.sort(key=lambda x: int(x.get("Number", 0)))
-            
-            print(f"Found {len(cameras)} cameras")
-            
-            images = []
-            for camera in cameras:
-                number = camera.get("Number")
-                name = camera.get("Name", f"Camera {number}")
-                latitude = float(camera.get("Latitude", 0))
-                longitude = float(camera.get("Longitude", 0))
+            # Camera metadata, keyed and ordered by camera number
+            cameras = list(load_cameras(self.camera_json_url).values())
+        except Exception as e:
+            print(f"Error fetching camera data: {e}")
+            return
+        
+        if limit:
+            cameras = cameras[:limit]
+        print(f"Found {len(cameras)} cameras")
+        
+        self._seen = load_image_state() if self.skip_unchanged else {}
+        
+        # Downloads run on their own event loop in a background thread
+        results = queue.Queue(maxsize=self.max_concurrency)
+        stop = threading.Event()
+        downloader = threading.Thread(
+            target=lambda: asyncio.run(self._download(cameras, results, stop)),
+            daemon=True
+        )
+        downloader.start()
+        
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
                 
-                # Construct image URL
-                image_url = self.image_url_template.format(number=number)
+                camera, result = item
+                number = camera["number"]
+                name = camera["name"]
                 
-                try:
-                    # Download image
-                    img_response = requests.get(image_url, timeout=10)
-                    img_response.raise_for_status()
-                    
-                    images.append({
-                        'id': number,
-                        'name': name,
-                        'image_bytes': img_response.content,
-                        'latitude': latitude,
-                        'longitude': longitude,
-                    })
-                    print(f"✓ Downloaded image for {name} (#{number})")
-                    
-                except Exception as e:
-                    print(f"✗ Failed to download image for {name} (#{number}): {e}")
+                if isinstance(result, Exception):
+                    print(f"✗ Failed to download image for {name} (#{number}): {result}")
                     continue
-            
-            return images
-            
-        except Exception as e:
-            print(f"Error fetching camera data: {e}")
-            return []
+                
+                image_bytes, state = result
+                if image_bytes is None:
+                    if state:
+                        self._seen[number] = state  # same image, newer Last-Modified
+                    print(f"⊘ Unchanged since last run: {name} (#{number})")
+                    continue
+                
+                print(f"✓ Downloaded image for {name} (#{number})")
+                yield {
+                    'id': number,
+                    'name': name,
+                    'image_bytes': image_bytes,
+                    'latitude': camera["latitude"],
+                    'longitude': camera["longitude"],
+                    'state': state,
+                }
+        finally:
+            stop.set()
+    
+    def mark_done(self, image: Dict[str, Any]):
+        if image.get('state'):
+            self._seen[image['id']] = image['state']
+    
+    def save_state(self):
+        if self.skip_unchanged and self._seen is not None:
+            save_image_state(self._seen)
 
 
 class LocalDirectorySource(ImageSource):
@@ -122,39 +243,44 @@ class LocalDirectorySource(ImageSource):
         self.directory = Path(directory)
         self.default_location = default_location or {"lat": 43.77, "lon": -79.23}
     
-    def get_images(self) -> List[Dict[str, Any]]:
-        """Loads images from local directory."""
-        images = []
-        
+    def iter_images(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Loads images from local directory, one file at a time."""
         if not self.directory.exists():
             print(f"Directory {self.directory} does not exist")
-            return []
+            return
+        
+        # scandir entries cache their file type, so is_file() needs no extra stat
+        with os.scandir(self.directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
         
-        for img_file in sorted(self.directory.iterdir()):
-            if not img_file.is_file():
+        loaded = 0
+        for entry in entries:
+            if limit and loaded >= limit:
+                break
+            
+            if not entry.name.lower().endswith(('.jpg', '.jpeg', '.png')):
                 continue
             
-            if img_file.suffix.lower() not in ['.jpg', '.jpeg', '.png']:
+            if not entry.is_file():
                 continue
             
             try:
-                with open(img_file, 'rb') as f:
+                with open(entry.path, 'rb') as f:
                     image_bytes = f.read()
-                
-                images.append({
-                    'id': img_file.stem,
-                    'name': img_file.name,
-                    'image_bytes': image_bytes,
-                    'latitude': self.default_location["lat"],
-                    'longitude': self.default_location["lon"],
-                })
-                print(f"✓ Loaded {img_file.name}")
-                
             except Exception as e:
-                print(f"✗ Failed to load {img_file.name}: {e}")
+                print(f"✗ Failed to load {entry.name}: {e}")
                 continue
-        
-        return images
+            
+            print(f"✓ Loaded {entry.name}")
+            loaded += 1
+            yield {
+                'id': os.path.splitext(entry.name)[0],
+                'name': entry.name,
+                'image_bytes': image_bytes,
+                'path': entry.path,
+                'latitude': self.default_location["lat"],
+                'longitude': self.default_location["lon"],
+            }
 
 
 # ==================== TICKET CREATION LOGIC ====================
@@ -214,12 +340,129 @@ class StreetSweepPipeline:
         image_source: ImageSource,
         ticket_creator: TicketCreator,
         upload_to_cloudinary: bool = True,
-        max_images: Optional[int] = None
+        max_images: Optional[int] = None,
+        upload_workers: int = 8,
+        batch_size: int = CLASSIFY_CONCURRENCY
     ):
         self.image_source = image_source
         self.ticket_creator = ticket_creator
         self.upload_to_cloudinary = upload_to_cloudinary
         self.max_images = max_images
+        self.upload_workers = upload_workers
+        self.batch_size = batch_size
+    
+    def _upload_image(self, img_meta: Dict[str, Any], image_hash: str, cached_url: Optional[str]) -> str:
+        """
+        Uploads one image to Cloudinary (if enabled) and returns its URL, reusing
+        the URL of an identical earlier upload when there is one.
+        The image bytes are released afterwards.
+        """
+        try:
+            if not self.upload_to_cloudinary:
+                return f"local://{img_meta['id']}"
+            
+            if cached_url:
+                return cached_url
+            
+            # The SDK reads paths and raw bytes as-is, no need for a BytesIO copy
+            upload_response = _upload(
+                img_meta.get('path') or img_meta['image_bytes'],
+                resource_type="image",
+                folder="streetsweep",
+            )
+            url = upload_response.get("secure_url")
+            cache_cloudinary_url(image_hash, url)
+            return url
+        finally:
+            img_meta.pop('image_bytes', None)
+    
+    @staticmethod
+    def _shrink_for_classification(image_bytes: bytes) -> bytes:
+        """Re-encodes an image for classification, or returns it as-is if Pillow can't read it."""
+        try:
+            return optimize_image(image_bytes, CLASSIFY_MAX_SIZE, CLASSIFY_QUALITY)
+        except Exception:
+            return image_bytes
+    
+    def _process_batches(
+        self,
+        images: Iterator[Dict[str, Any]],
+        executor: ThreadPoolExecutor,
+        uploads: Dict[Any, tuple],
+        stats: Dict[str, Any],
+        classify_breaker: CircuitBreaker,
+        upload_breaker: CircuitBreaker
+    ):
+        """
+        Classifies images in batches and submits uploads for those above the
+        threshold. Raises CircuitOpen if either service keeps failing.
+        """
+        while batch := list(islice(images, self.batch_size)):
+            # Classification only needs a small JPEG; the original is kept for upload
+            small = [self._shrink_for_classification(m['image_bytes']) for m in batch]
+            
+            # Reuse severities already computed for identical images
+            hashes = [hashlib.blake2b(b, digest_size=16).hexdigest() for b in small]
+            cached = get_cached_classifications(hashes)
+            classifications = [{"severity": cached[h]["severity"]} if h in cached else None for h in hashes]
+            misses = [i for i, h in enumerate(hashes) if h not in cached]
+            
+            # Classify the rest concurrently while earlier uploads proceed
+            print(f"\n→ Classifying {len(misses)} images ({len(batch) - len(misses)} cached)...")
+            # The pipeline only needs the severity, so skip the base64 copy of each image
+            fresh = classify_images_batch(
+                [small[i] for i in misses],
+                include_base64=False,
+                optimize=False
+            )
+            del small
+            new_severities = {}
+            for i, result in zip(misses, fresh):
+                classifications[i] = result
+                classify_breaker.record(not isinstance(result, Exception))
+                if not isinstance(result, Exception) and result.get("severity") is not None:
+                    new_severities[hashes[i]] = result["severity"]
+            cache_severities(new_severities)
+            
+            for img_meta, image_hash, classification in zip(batch, hashes, classifications):
+                stats["total_images"] += 1
+                print(f"\n[{stats['total_images']}] Processing: {img_meta['name']}")
+                
+                try:
+                    if isinstance(classification, Exception):
+                        raise classification
+                    severity = classification.get("severity")
+                    
+                    if severity is None:
+                        print(f"  ✗ Failed to classify severity")
+                        stats["errors"] += 1
+                        continue
+                    
+                    stats["classified"] += 1
+                    print(f"  ✓ Severity: {severity}/10")
+                    
+                    # Check if ticket should be created
+                    if not self.ticket_creator.should_create_ticket(severity):
+                        print(f"  ⊘ Severity below threshold - skipping")
+                        stats["skipped"] += 1
+                        self.image_source.mark_done(img_meta)
+                        continue
+                    
+                    cached_url = cached.get(image_hash, {}).get("cloudinary_url")
+                    future = executor.submit(self._upload_image, img_meta, image_hash, cached_url)
+                    future.add_done_callback(
+                        lambda f: f.cancelled() or upload_breaker.record(f.exception() is None)
+                    )
+                    uploads[future] = (img_meta, severity)
+                    print(f"  ✓ Queued for upload")
+                    
+                except Exception as e:
+                    print(f"  ✗ Error processing image: {e}")
+                    stats["errors"] += 1
+                    continue
+            
+            classify_breaker.check()
+            upload_breaker.check()
     
     def run(self) -> Dict[str, Any]:
         """
@@ -235,83 +478,92 @@ class StreetSweepPipeline:
         print("STREETSWEEP AI PIPELINE - Starting")
         print("=" * 60)
         
-        # Fetch images
-        images = self.image_source.get_images()
-        
+        # Images are streamed from the source; each one is dropped after upload
+        images = self.image_source.iter_images(self.max_images)
         if self.max_images:
-            images = images[:self.max_images]
             print(f"\nLimiting to first {self.max_images} images")
         
-        if not images:
-            print("No images to process!")
-            return {"error": "No images found"}
-        
-        print(f"\n{len(images)} images ready for processing\n")
-        
         # Process each image
         stats = {
-            "total_images": len(images),
+            "total_images": 0,
             "classified": 0,
             "tickets_created": 0,
             "skipped": 0,
             "errors": 0,
             "created_ticket_ids": []
         }
+        pending_tickets = []  # create_ticket kwargs, inserted in one batch at the end
+        pending_images = []  # image metadata for each pending ticket
         
-        for idx, img_meta in enumerate(images, 1):
-            print(f"\n[{idx}/{len(images)}] Processing: {img_meta['name']}")
-            
+        # Stop the run early if Gemini or Cloudinary fail most of their recent calls
+        classify_breaker = CircuitBreaker("Gemini")
+        upload_breaker = CircuitBreaker("Cloudinary")
+        uploads = {}  # upload future -> (image metadata, severity)
+        
+        def abort(reason: CircuitOpen):
+            print(f"\n✗ Aborting run: {reason}")
+            stats["aborted"] = str(reason)
+            images.close()
+            # Uploads that haven't started are dropped; finished ones still get tickets
+            for future in uploads:
+                future.cancel()
+        
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as executor:
             try:
-                # Classify image
-                print(f"  → Classifying...")
-                classification = classify_image(img_meta['image_bytes'])
-                severity = classification.get("severity")
-                
-                if severity is None:
-                    print(f"  ✗ Failed to classify severity")
+                self._process_batches(
+                    images, executor, uploads, stats, classify_breaker, upload_breaker
+                )
+            except CircuitOpen as e:
+                abort(e)
+            
+            # Queue each ticket as soon as its upload finishes
+            for future in as_completed(uploads):
+                img_meta, severity = uploads[future]
+                if future.cancelled():
+                    print(f"⊘ Upload cancelled for {img_meta['name']}")
                     stats["errors"] += 1
                     continue
-                
-                stats["classified"] += 1
-                print(f"  ✓ Severity: {severity}/10")
-                
-                # Check if ticket should be created
-                if not self.ticket_creator.should_create_ticket(severity):
-                    print(f"  ⊘ Severity below threshold - skipping")
-                    stats["skipped"] += 1
-                    continue
-                
-                # Upload to Cloudinary
-                if self.upload_to_cloudinary:
-                    print(f"  → Uploading to Cloudinary...")
-                    upload_response = cloudinary.uploader.upload(
-                        io.BytesIO(img_meta['image_bytes']),
-                        resource_type="image",
-                        folder="streetsweep",
+                try:
+                    cloudinary_url = future.result()
+                    ticket_data = self.ticket_creator.create_ticket_data(
+                        img_meta, 
+                        severity,
+                        cloudinary_url
                     )
-                    cloudinary_url = upload_response.get("secure_url")
-                    print(f"  ✓ Uploaded")
-                else:
-                    cloudinary_url = f"local://{img_meta['id']}"
-                
-                # Create ticket
-                print(f"  → Creating ticket...")
-                ticket_data = self.ticket_creator.create_ticket_data(
-                    img_meta, 
-                    severity,
-                    cloudinary_url
-                )
-                
-                ticket_id = create_ticket(**ticket_data)
-                print(f"  ✓ Ticket created: {ticket_id}")
-                
-                stats["tickets_created"] += 1
-                stats["created_ticket_ids"].append(ticket_id)
-                
+                    pending_tickets.append(ticket_data)
+                    pending_images.append(img_meta)
+                    print(f"✓ Uploaded {img_meta['name']}, ticket queued")
+                except Exception as e:
+                    print(f"✗ Error uploading {img_meta['name']}: {e}")
+                    stats["errors"] += 1
+                    if "aborted" not in stats:
+                        try:
+                            upload_breaker.check()
+                        except CircuitOpen as reason:
+                            abort(reason)
+        
+        # Insert all tickets in a single round trip
+        if pending_tickets:
+            print(f"\n→ Creating {len(pending_tickets)} tickets...")
+            try:
+                ticket_ids = create_tickets_bulk(pending_tickets)
             except Exception as e:
-                print(f"  ✗ Error processing image: {e}")
-                stats["errors"] += 1
-                continue
+                print(f"✗ Ticket creation failed: {e}")
+                stats["errors"] += len(pending_tickets)
+            else:
+                for ticket_id in ticket_ids:
+                    print(f"  ✓ Ticket created: {ticket_id}")
+                stats["tickets_created"] += len(ticket_ids)
+                stats["created_ticket_ids"].extend(ticket_ids)
+                for img_meta in pending_images:
+                    self.image_source.mark_done(img_meta)
+        
+        # Only images handled above are recorded, also when the run was aborted
+        self.image_source.save_state()
+        
+        if not stats["total_images"]:
+            print("No images to process!")
+            return {"error": "No images found"}
         
         # Print summary
         print("\n" + "=" * 60)
@@ -322,6 +574,8 @@ class StreetSweepPipeline:
         print(f"Tickets created:         {stats['tickets_created']}")
         print(f"Skipped (low severity):  {stats['skipped']}")
         print(f"Errors:                  {stats['errors']}")
+        if "aborted" in stats:
+            print(f"Aborted early:           {stats['aborted']}")
         print("=" * 60)
         
         return stats
@@ -329,27 +583,36 @@ class StreetSweepPipeline:
 
 # ==================== MAIN EXECUTION ====================
 
-def generate_pipeline_insights():
+def generate_pipeline_insights(use_full_dataset: bool = False):
     """
     Generates insights from all tickets in the database.
     Writes the insights to insight.txt file.
+    
+    Args:
+        use_full_dataset: Build the summary in Python by streaming every ticket
+                          instead of aggregating server-side
     """
     print("\n" + "=" * 60)
     print("GENERATING INSIGHTS")
     print("=" * 60)
     
     try:
-        # Fetch all tickets from database
-        all_tickets = list(tickets.find({}))
-        print(f"Found {len(all_tickets)} tickets in database")
+        if use_full_dataset:
+            # Stream only the fields the summary needs; nothing is held in a list
+            cursor = tickets.find({}, {"_id": 0, "location": 1, "severity": 1})
+            summary = summarize_tickets(cursor)
+        else:
+            # Summarize tickets server-side (only the aggregates cross the wire)
+            summary = get_ticket_stats()
+        print(f"Found {summary['total_tickets']} tickets in database")
         
-        if not all_tickets:
+        if not summary["total_tickets"]:
             print("No tickets to analyze")
             return
         
         # Generate insights using Gemini
         print("Generating AI insights...")
-        insight = generate_insight(all_tickets)
+        insight = generate_insight(summary)
         
         # Write to file
         with open("insight.txt", "w", encoding="utf-8") as f:
@@ -405,54 +668,32 @@ def run_local_directory_pipeline(directory: str, max_images: Optional[int] = Non
 
 
 if __name__ == "__main__":
+    # Runs the pipeline once and exits. Scheduling (every 2 weeks) and
+    # retries are handled by deploy/streetsweep.timer and streetsweep.service.
+    import sys
     import datetime
     
-    TWO_WEEKS_SECONDS = 14 * 24 * 60 * 60  # 14 days in seconds
-    
     print("=" * 60)
     print("STREETSWEEP AI AUTOMATED PIPELINE")
-    print("Runs every 2 weeks")
     print("=" * 60)
-    print()
     
-    while True:
-        try:
-            # Record start time
-            start_time = datetime.datetime.now()
-            print(f"\nPipeline started at: {start_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            
-            # Run the pipeline with Toronto CCTV cameras
-            # Limit to first 50 images to avoid excessive API costs
-            stats = run_toronto_cctv_pipeline(max_images=50)
-            
-            # Generate insights after processing
-            generate_pipeline_insights()
-            
-            # Record end time
-            end_time = datetime.datetime.now()
-            duration = end_time - start_time
-            print(f"\n✓ Pipeline completed at: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"Duration: {duration}")
-            
-            # Calculate next run time
-            next_run = end_time + datetime.timedelta(seconds=TWO_WEEKS_SECONDS)
-            print(f"\nNext run scheduled for: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"Sleeping for 2 weeks...\n")
-            
-            # Sleep for 2 weeks
-            time.sleep(TWO_WEEKS_SECONDS)
-            
-        except KeyboardInterrupt:
-            print("\n\n  Pipeline stopped by user (Ctrl+C)")
-            break
-        except Exception as e:
-            print(f"\n\n✗ Pipeline error: {e}")
-            print("Retrying in 1 hour...")
-            time.sleep(3600)  # Wait 1 hour before retrying on error
+    start_time = datetime.datetime.now()
+    print(f"\nPipeline started at: {start_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    
+    try:
+        # Run the pipeline with Toronto CCTV cameras
+        # Limit to first 50 images to avoid excessive API costs
+        run_toronto_cctv_pipeline(max_images=50)
+        
+        # Generate insights after processing
+        generate_pipeline_insights()
+    except Exception as e:
+        print(f"\n\n✗ Pipeline error: {e}")
+        sys.exit(1)
     
-    print("\nPipeline terminated.")
+    end_time = datetime.datetime.now()
+    print(f"\n✓ Pipeline completed at: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Duration: {end_time - start_time}")
     
-    # For manual one-time execution, uncomment below:
-    # run_toronto_cctv_pipeline(max_images=10)
-    # generate_pipeline_insights()
+    # For manual runs against other sources:
     # run_local_directory_pipeline("./demoimages", max_images=5)
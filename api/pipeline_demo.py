@@ -13,36 +13,24 @@ Usage:
 
 import sys
 import re
-import json
 import os
 import io
 from pathlib import Path
 from dotenv import load_dotenv
-import requests
-import cloudinary
-import cloudinary.uploader
-from Database import create_ticket
+from cloudinary_client import get_cloudinary
+from Database import create_tickets_bulk
+from toronto_cameras import CAMERA_JSON_URL, load_cameras
 
 load_dotenv()
 
-# Configure Cloudinary - parse URL manually like ingestion script
-cloudinary_url = os.getenv("CLOUDINARY_URL")
-if not cloudinary_url:
-    raise ValueError("CLOUDINARY_URL not found in environment variables")
-
-# Parse cloudinary:// URL format manually
-match = re.match(r"cloudinary://([^:]+):([^@]+)@(.+)", cloudinary_url)
-if match:
-    api_key, api_secret, cloud_name = match.groups()
-    cloudinary.config(api_key=api_key, api_secret=api_secret, cloud_name=cloud_name)
-else:
-    cloudinary.config(cloudinary_url=cloudinary_url)
-
 BASE_DIR = Path(__file__).resolve().parent
 DEMOIMAGES_DIR = BASE_DIR / "demoimages"
 
-# Toronto camera metadata URL
-CAMERA_JSON_URL = "https://opendata.toronto.ca/transportation/tmc/rescucameraimages/Data/tmcearthcameras.json"
+# Tickets are inserted in batches of this size instead of one round trip each
+TICKET_BATCH_SIZE = 100
+
+# Demo image filenames: {Number}_DEMO{Demo#}_S{Severity}.png/jpg
+_DEMO_RE = re.compile(r"^(\d+)_DEMO(\d+)_S(\d+)\.(png|jpg)$")
 
 
 def fetch_camera_locations():
@@ -52,31 +40,7 @@ def fetch_camera_locations():
     """
     print("Fetching camera location data...")
     try:
-        response = requests.get(CAMERA_JSON_URL, timeout=30)
-        response.raise_for_status()
-        
-        # Extract JSON from callback wrapper
-        # Format: jsonTMCEarthCamerasCallback({...data...});
-        json_text = response.text.strip()
-        
-        if json_text.startswith("jsonTMCEarthCamerasCallback("):
-            # Remove callback wrapper: extract content between ( and );
-            start = json_text.index("(") + 1
-            end = json_text.rindex(")")
-            json_text = json_text[start:end]
-        
-        data = json.loads(json_text)
-        cameras = data.get("Data", [])
-        
-        # Create lookup dict: number -> location info
-        camera_map = {}
-        for camera in cameras:
-            number = camera.get("Number")
-            camera_map[number] = {
-                "name": camera.get("Name", f"Camera {number}"),
-                "latitude": float(camera.get("Latitude", 0)),
-                "longitude": float(camera.get("Longitude", 0))
-            }
+        camera_map = load_cameras(CAMERA_JSON_URL)
         
         print(f"✓ Loaded {len(camera_map)} camera locations")
         return camera_map
@@ -94,13 +58,11 @@ def parse_demo_filename(filename: str):
     
     Returns dict with: number, demo_num, severity, or None if not a severity file
     """
-    # Skip OG (original) files
-    if "_OG." in filename:
+    # Skip OG (original) files without running the regex
+    if filename.endswith(("_OG.png", "_OG.jpg")):
         return None
     
-    # Match pattern: {Number}_DEMO{Demo#}_S{Severity}
-    pattern = r"^(\d+)_DEMO(\d+)_S(\d+)\.(png|jpg)$"
-    match = re.match(pattern, filename)
+    match = _DEMO_RE.match(filename)
     
     if not match:
         return None
@@ -137,17 +99,19 @@ def process_demo_images(selected_demos=None):
         print(f"Demo images directory not found: {DEMOIMAGES_DIR}")
         return
     
-    demo_files = sorted(DEMOIMAGES_DIR.iterdir())
+    # scandir entries cache their file type, so is_file() needs no extra stat
+    with os.scandir(DEMOIMAGES_DIR) as it:
+        demo_files = sorted(it, key=lambda e: e.name)
     print(f"\nFound {len(demo_files)} files in demoimages/")
     
     # Parse and filter demo files
     demo_images_by_demo = {}  # Group by demo number
-    for file_path in demo_files:
-        if not file_path.is_file():
+    for entry in demo_files:
+        metadata = parse_demo_filename(entry.name)
+        if not metadata:
             continue
         
-        metadata = parse_demo_filename(file_path.name)
-        if not metadata:
+        if not entry.is_file():
             continue
         
         # Filter by selected demos if specified
@@ -160,14 +124,14 @@ def process_demo_images(selected_demos=None):
         # Keep only the highest severity for each demo
         if demo_num not in demo_images_by_demo:
             demo_images_by_demo[demo_num] = {
-                "path": file_path,
+                "path": Path(entry.path),
                 "metadata": metadata
             }
         else:
             # Replace if this one has higher severity
             if severity > demo_images_by_demo[demo_num]["metadata"]["severity"]:
                 demo_images_by_demo[demo_num] = {
-                    "path": file_path,
+                    "path": Path(entry.path),
                     "metadata": metadata
                 }
     
@@ -193,6 +157,25 @@ def process_demo_images(selected_demos=None):
         "errors": 0,
         "ticket_ids": []
     }
+    pending_tickets = []
+    
+    def flush_tickets():
+        if not pending_tickets:
+            return
+        print(f"→ Creating {len(pending_tickets)} tickets...")
+        try:
+            ticket_ids = create_tickets_bulk(pending_tickets)
+        except Exception as e:
+            print(f"✗ Ticket creation failed: {e}")
+            stats["errors"] += len(pending_tickets)
+        else:
+            for ticket_id in ticket_ids:
+                print(f"  ✓ Ticket created: {ticket_id}")
+            stats["processed"] += len(ticket_ids)
+            stats["tickets_created"] += len(ticket_ids)
+            stats["ticket_ids"].extend(ticket_ids)
+        pending_tickets.clear()
+        print()
     
     for idx, demo in enumerate(demo_images, 1):
         file_path = demo["path"]
@@ -225,7 +208,7 @@ def process_demo_images(selected_demos=None):
             # Upload to Cloudinary
             print(f"  → Uploading to Cloudinary...")
             try:
-                upload_response = cloudinary.uploader.upload(
+                upload_response = get_cloudinary().uploader.upload(
                     str(file_path),
                     resource_type="image",
                     folder="streetsweep",
@@ -237,21 +220,17 @@ def process_demo_images(selected_demos=None):
                 stats["errors"] += 1
                 continue
             
-            # Create ticket
-            print(f"  → Creating ticket...")
-            ticket_id = create_ticket(
-                image_url=image_url,
-                location={"lat": latitude, "lon": longitude},
-                severity=severity,
-                description=f"DEMO{demo_num}: {location_name}",
-                claimed=False
-            )
-            
-            print(f"  ✓ Ticket created: {ticket_id}")
-            stats["processed"] += 1
-            stats["tickets_created"] += 1
-            stats["ticket_ids"].append(ticket_id)
+            # Queue ticket for the next bulk insert
+            pending_tickets.append({
+                "image_url": image_url,
+                "location": {"lat": latitude, "lon": longitude},
+                "severity": severity,
+                "description": f"DEMO{demo_num}: {location_name}",
+                "claimed": False
+            })
             print()
+            if len(pending_tickets) >= TICKET_BATCH_SIZE:
+                flush_tickets()
             
         except Exception as e:
             print(f"  ✗ Error: {e}")
@@ -259,6 +238,8 @@ def process_demo_images(selected_demos=None):
             print()
             continue
     
+    flush_tickets()
+    
     # Print summary
     print("=" * 60)
     print("DEMO PIPELINE COMPLETE - Summary")
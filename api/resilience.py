@@ -0,0 +1,68 @@
+"""
+Retry and circuit-breaker helpers for calls to external services
+(Gemini, Cloudinary, the Toronto open data portal).
+"""
+
+import threading
+from collections import deque
+
+import httpx
+import requests
+import cloudinary.exceptions
+from google.genai import errors as genai_errors
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for network blips, timeouts, rate limits and 5xx responses worth retrying."""
+    if isinstance(exc, (ConnectionError, TimeoutError, requests.ConnectionError,
+                        requests.Timeout, httpx.TransportError, genai_errors.ServerError)):
+        return True
+    if isinstance(exc, genai_errors.ClientError):
+        return exc.code == 429
+    # The Cloudinary SDK raises its base Error for everything; these prefixes are its network failures
+    if isinstance(exc, cloudinary.exceptions.Error):
+        return str(exc).startswith(("Unexpected error", "Socket error"))
+    return False
+
+
+# 3 attempts, waiting 1s then 2s (capped at 10s) between them
+transient_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, max=10),
+    retry=retry_if_exception(is_transient),
+    reraise=True,
+)
+
+
+class CircuitOpen(Exception):
+    """Raised once too many recent calls to a service have failed."""
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last `window` calls to a service. check() raises
+    CircuitOpen when more than `failure_threshold` of them failed, so a run
+    can stop instead of paying a full timeout for every remaining item.
+    """
+
+    def __init__(self, name: str, window: int = 20, failure_threshold: float = 0.7):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, success: bool):
+        with self._lock:
+            self._outcomes.append(success)
+
+    def check(self):
+        with self._lock:
+            # Only judge once the window is full, so a few early failures don't trip it
+            if len(self._outcomes) < self._outcomes.maxlen:
+                return
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) > self.failure_threshold:
+                raise CircuitOpen(
+                    f"{self.name}: {failures} of the last {len(self._outcomes)} calls failed"
+                )
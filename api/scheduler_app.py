@@ -0,0 +1,78 @@
+"""
+Long-running pipeline service.
+
+Runs the Toronto CCTV pipeline every 2 weeks and on demand via
+POST /pipeline/run, keeping the SDK clients and Mongo pool warm between runs.
+Alternative to the one-shot systemd timer in deploy/.
+
+Start with: uvicorn scheduler_app:app --workers 1
+(one worker, otherwise every worker schedules its own runs)
+"""
+
+import os
+import threading
+
+from fastapi import FastAPI, BackgroundTasks, Depends
+from fastapi.responses import ORJSONResponse
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from auth import get_current_user
+from pipeline import run_toronto_cctv_pipeline, generate_pipeline_insights
+
+# Limit to first 50 images to avoid excessive API costs
+MAX_IMAGES = 50
+
+app = FastAPI(default_response_class=ORJSONResponse)
+scheduler = AsyncIOScheduler()
+
+# A manual trigger while a run is in progress would file duplicate tickets
+_run_lock = threading.Lock()
+
+
+def run_pipeline(max_images: int = MAX_IMAGES):
+    """Runs the pipeline and regenerates insights, unless a run is already in progress."""
+    if not _run_lock.acquire(blocking=False):
+        print("⊘ Pipeline already running - skipping")
+        return
+    try:
+        run_toronto_cctv_pipeline(max_images=max_images)
+        generate_pipeline_insights()
+    except Exception as e:
+        print(f"✗ Pipeline error: {e}")
+    finally:
+        _run_lock.release()
+
+
+@app.on_event("startup")
+def start_scheduler():
+    # Sync jobs run on the scheduler's thread pool, off the event loop
+    scheduler.add_job(run_pipeline, "interval", weeks=2, id="toronto_cctv", replace_existing=True)
+    scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    scheduler.shutdown(wait=False)
+
+
+@app.post("/pipeline/run")
+def run_pipeline_endpoint(background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+    """Start a pipeline run in the background."""
+    if _run_lock.locked():
+        return {"status": "already running"}
+    background_tasks.add_task(run_pipeline)
+    return {"status": "started"}
+
+
+@app.get("/pipeline/status")
+def pipeline_status():
+    job = scheduler.get_job("toronto_cctv")
+    return {
+        "running": _run_lock.locked(),
+        "next_run": job.next_run_time.isoformat() if job and job.next_run_time else None,
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8001)))
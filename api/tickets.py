@@ -1,43 +1,150 @@
 # tickets.py
-import threading
-import os
-import base64
+import asyncio
 import io
+import multiprocessing
+import os
+import pybase64
+from concurrent.futures import ProcessPoolExecutor
 
 from auth import get_current_user
 
 from bson.objectid import ObjectId
 from dotenv import load_dotenv
 
-import cloudinary
-import cloudinary.uploader
-
-from watchers import watch_ticket_inserts
-from Database import create_ticket, resolve_ticket, tickets, claim_ticket
+from cloudinary_client import upload_image_async
+from watchers import run_as_leader, watch_ticket_inserts
+from Database import create_ticket, resolve_ticket, async_tickets, async_tickets_json, async_leases, claim_ticket, ensure_indexes
 from pydantic import BaseModel
 
-from fastapi import APIRouter, Depends, UploadFile, File
-from auth import get_current_user
-from gemini_api import classify_image, compare_image, get_insight
+from fastapi import APIRouter, Depends, UploadFile, File, Request
+from starlette.datastructures import UploadFile as StarletteUploadFile  # what request.form() returns
+from auth import get_current_user, invalidate_user
+from gemini_api import classify_image_async, compare_image_async, get_insight
+from image_utils import optimize_image
 
 
 load_dotenv()
 
-# Configure Cloudinary
-cloudinary.config(cloudinary_url=os.getenv("CLOUDINARY_URL"))
-
 router = APIRouter()
 
+# Image resizing/re-encoding is CPU-bound; worker processes keep it off the
+# event loop and out of the GIL, so concurrent uploads use every core.
+# The cores are shared between uvicorn workers. Created on startup.
+image_pool: ProcessPoolExecutor | None = None
+
+
+async def optimize_off_loop(image_bytes: bytes) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(image_pool, optimize_image, image_bytes)
+
+@router.on_event("startup")
+def start_image_pool():
+    # Spawned, not forked: the server process already runs threads (thread
+    # pools, HTTP clients), and forking a threaded process can deadlock the child
+    global image_pool
+    if image_pool is None:  # startup handlers can run twice, see prepare_database
+        image_pool = ProcessPoolExecutor(
+            max_workers=max(1, os.cpu_count() // int(os.getenv("WEB_CONCURRENCY", 1))),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+_database_prepared = False
+
+@router.on_event("startup")
+async def prepare_database():
+    # FastAPI runs an included router's startup handlers twice (once from the
+    # app, once from the router's own lifespan), so this one guards itself
+    global _database_prepared
+    if not _database_prepared:
+        _database_prepared = True
+        await ensure_indexes()
+
 # ---------- background watcher ----------
 
+_watch_task: asyncio.Task | None = None
+
 @router.on_event("startup")
-def start_watchers():
-    t = threading.Thread(
-        target=watch_ticket_inserts,
-        args=(tickets,),
-        daemon=True,
-    )
-    t.start()
+async def start_watchers():
+    # One change stream across all uvicorn workers: whichever holds the lease watches
+    global _watch_task
+    if _watch_task is None:  # startup handlers can run twice, see prepare_database
+        _watch_task = asyncio.create_task(
+            run_as_leader(async_leases, "ticket_watcher", lambda: watch_ticket_inserts(async_tickets))
+        )
+
+@router.on_event("shutdown")
+async def stop_watchers():
+    if _watch_task:
+        _watch_task.cancel()
+
+@router.on_event("shutdown")
+def stop_image_pool():
+    if image_pool:
+        image_pool.shutdown(wait=True, cancel_futures=True)
+
+# Largest accepted image, for base64 payloads and file uploads
+MAX_IMAGE_SIZE = 10_000_000
+
+async def read_body_capped(request: Request, limit: int) -> bytes | None:
+    """Stream the request body into memory; None once it grows past limit."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        return None
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+class InvalidBase64(ValueError):
+    """Raised by Base64File.read() when the payload isn't valid base64."""
+
+class Base64File:
+    """
+    Read-only binary file over a base64 str that decodes one read() at a time,
+    so an upload never holds the whole decoded image. Supports the tell/seek
+    calls httpx makes to size a multipart body.
+    """
+
+    def __init__(self, data: str, start: int = 0):
+        self._data = data
+        self._start = start
+        self._pos = start
+        tail = data[-2:]
+        self._length = (len(data) - start) * 3 // 4 - (len(tail) - len(tail.rstrip("=")))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._data)
+        if size is not None and size >= 0:
+            # Whole 4-char groups, so every chunk decodes on its own
+            end = min(end, self._pos + (size + 2) // 3 * 4)
+        chunk = self._data[self._pos:end]
+        self._pos = end
+        try:
+            return pybase64.b64decode(chunk, validate=True)
+        except ValueError as e:  # binascii.Error, or non-ASCII characters
+            raise InvalidBase64(str(e)) from e
+
+    def tell(self) -> int:
+        return min((self._pos - self._start) // 4 * 3, self._length)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_END:
+            offset += self._length
+        elif whence == os.SEEK_CUR:
+            offset += self.tell()
+        if offset >= self._length:
+            self._pos, offset = len(self._data), self._length
+        elif offset % 3 == 0:
+            self._pos = self._start + offset // 3 * 4
+        else:
+            raise io.UnsupportedOperation("Base64File can only seek to 3-byte boundaries")
+        return offset
 
 # ---------- request models ----------
 
@@ -64,10 +171,11 @@ def health_check():
     return {"status": "ok"}
 
 @router.post("/create-ticket")
-def create_ticket_endpoint(ticket: TicketRequest, current_user: dict = Depends(get_current_user)):
+async def create_ticket_endpoint(ticket: TicketRequest, current_user: dict = Depends(get_current_user)):
     """
     Create a ticket from Gemini analysis results.
-    Uploads base64 image to Cloudinary if provided.
+    Pass the image_url returned by /classify; a base64 image is still
+    accepted and uploaded to Cloudinary.
     """
     try:
         image_url = ticket.image_url or ""
@@ -76,31 +184,42 @@ def create_ticket_endpoint(ticket: TicketRequest, current_user: dict = Depends(g
         if ticket.image_base64:
             data = ticket.image_base64
 
-            # Remove data URI prefix if present
+            # Trailing newlines would fail validation (rstrip copies, so only when needed)
+            if data[-1:].isspace():
+                data = data.rstrip()
+
+            # Skip the data URI prefix if present (without copying the payload).
+            # Prefixes like "data:image/jpeg;base64," are short, so only search the head.
+            start = 0
             if data.startswith("data:"):
-                data = data.split(",", 1)[1]
+                start = data.find(",", 5, 128) + 1
+                if not start:
+                    return {"error": "Invalid data URI"}
 
-            # Decode base64 to bytes
-            img_bytes = base64.b64decode(data)
+            # Decoded lazily while uploading (SIMD decoder; rejects characters
+            # outside the alphabet), 64 KB at a time
+            img_file = Base64File(data, start)
 
-            # Size validation (10 MB max)
-            MAX_SIZE = 10_000_000
-            if len(img_bytes) > MAX_SIZE:
-                return {"error": f"Image too large (max {MAX_SIZE} bytes)"}
+            # Size validation (10 MB max), from the base64 length so oversized
+            # payloads are rejected without decoding them
+            if len(img_file) > MAX_IMAGE_SIZE:
+                return {"error": f"Image too large (max {MAX_IMAGE_SIZE} bytes)"}
 
             # Upload to Cloudinary
             try:
-                upload_response = cloudinary.uploader.upload(
-                    io.BytesIO(img_bytes),
-                    resource_type="image",
+                upload_response = await upload_image_async(
+                    img_file,
                     folder="streetsweep",  # organize in folder
                 )
                 image_url = upload_response.get("secure_url")
+            except InvalidBase64:
+                # Found while streaming the upload, so nothing reaches Cloudinary
+                return {"error": "Invalid base64 image"}
             except Exception as e:
                 return {"error": f"Cloudinary upload failed: {str(e)}"}
 
         # Create ticket with image URL (Cloudinary or fallback)
-        ticket_id = create_ticket(
+        ticket_id = await create_ticket(
             image_url=image_url,
             location=ticket.location,
             severity=ticket.severity,
@@ -120,35 +239,34 @@ def create_ticket_endpoint(ticket: TicketRequest, current_user: dict = Depends(g
     except Exception as e:
         return {"error": str(e)}
 
-@router.get("/tickets")
-def get_all_tickets():
-    """Get all tickets (resolved and unresolved)."""
+@router.get("/tickets", response_model=None)
+async def get_all_tickets(limit: int = 100, skip: int = 0):
+    """Get the newest tickets (resolved and unresolved), `limit` per page after skipping `skip`."""
     try:
-        all_tickets = list(tickets.find({}))
-        # Convert ObjectId to string for JSON
-        for ticket in all_tickets:
-            ticket["_id"] = str(ticket["_id"])
+        all_tickets = await (
+            async_tickets_json.find({}).sort("timestamp", -1).skip(skip).limit(limit).to_list()
+        )
         return {"tickets": all_tickets}
     except Exception as e:
         return {"error": str(e)}
 
 @router.get("/tickets/{ticket_id}")
-def get_ticket(ticket_id: str):
+async def get_ticket(ticket_id: str):
     """Get a specific ticket by ID."""
     try:
-        ticket = tickets.find_one({"_id": ObjectId(ticket_id)})
+        ticket = await async_tickets_json.find_one({"_id": ObjectId(ticket_id)})
         if ticket:
-            ticket["_id"] = str(ticket["_id"])
             return ticket
         return {"error": "Ticket not found"}
     except Exception as e:
         return {"error": str(e)}
 
 @router.post("/resolve-ticket")
-def resolve_ticket_endpoint(data: ResolveTicketRequest, current_user: dict = Depends(get_current_user)):
+async def resolve_ticket_endpoint(data: ResolveTicketRequest, current_user: dict = Depends(get_current_user)):
     """Mark a ticket as resolved."""
     try:
-        success = resolve_ticket(data.ticket_id, data.user_id)
+        success = await resolve_ticket(data.ticket_id, data.user_id)
+        invalidate_user(data.user_id)  # points changed
         if success:
             return {
                 "message": "Ticket resolved",
@@ -160,10 +278,10 @@ def resolve_ticket_endpoint(data: ResolveTicketRequest, current_user: dict = Dep
         return {"error": str(e)}
 
 @router.post("/claim")
-def claim_ticket_endpoint(ticket_id: str, user_id: str):
+async def claim_ticket_endpoint(ticket_id: str, user_id: str):
     """Claim or unclaim a ticket by a user (toggles claim state)."""
     try:
-        result = claim_ticket(ticket_id, user_id)
+        result = await claim_ticket(ticket_id, user_id)
         if result == 1:
             return {
                 "message": "Ticket claimed",
@@ -183,14 +301,49 @@ def claim_ticket_endpoint(ticket_id: str, user_id: str):
         return {"error": str(e)}
     
 @router.post("/classify")
-async def classify_endpoint(
-    file: UploadFile = File(...),
-):
+async def classify_endpoint(request: Request):
     """
     Classify a user-uploaded image for trash severity.
+    Send it as the multipart form field "file", or as the raw request body
+    (Content-Type: image/*), which is streamed into memory with no temp file.
+    The image is uploaded to Cloudinary at the same time; pass the returned
+    image_url to /create-ticket instead of sending the image back.
     """
-    raw = await file.read()
-    return classify_image(raw)
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        try:
+            file = form.get("file")
+            if not isinstance(file, StarletteUploadFile):
+                return {"error": "No file uploaded"}
+            if file.size is not None and file.size > MAX_IMAGE_SIZE:
+                return {"error": f"Image too large (max {MAX_IMAGE_SIZE} bytes)"}
+            raw = await file.read()
+        finally:
+            # Uploads are spooled to temp files that stay open until closed
+            await form.close()
+    else:
+        raw = await read_body_capped(request, MAX_IMAGE_SIZE)
+        if raw is None:
+            return {"error": f"Image too large (max {MAX_IMAGE_SIZE} bytes)"}
+        if not raw:
+            return {"error": "No file uploaded"}
+
+    # Upload while classifying, but don't leave an orphaned image in Cloudinary
+    # when classification fails
+    upload = asyncio.create_task(upload_image_async(raw, folder="streetsweep"))
+    try:
+        optimized = await optimize_off_loop(raw)
+        result = await classify_image_async(optimized)
+        upload_response = await upload
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        upload.cancel()  # no-op once the upload has finished
+
+    return {
+        "severity": result.get("severity"),
+        "image_url": upload_response.get("secure_url"),
+    }
 
 @router.post("/compare")
 async def compare_endpoint(
@@ -205,9 +358,14 @@ async def compare_endpoint(
     upload the second image to Cloudinary and replace the ticket's image_url
     (when a ticket_id is provided).
     """
+    for f in (file1, file2):
+        if f.size is not None and f.size > MAX_IMAGE_SIZE:
+            return {"error": f"Image too large (max {MAX_IMAGE_SIZE} bytes)"}
+
     raw1 = await file1.read()
     raw2 = await file2.read()
-    result = compare_image(raw1, raw2)
+    before, after = await asyncio.gather(optimize_off_loop(raw1), optimize_off_loop(raw2))
+    result = await compare_image_async(before, after)
 
     # Success path: same location AND cleanup successful
     if result.get("same_location") is True and result.get("cleanup_successful") is True:
@@ -215,18 +373,15 @@ async def compare_endpoint(
 
     # Fallback: upload second image and replace the ticket image_url
     try:
-        upload_response = cloudinary.uploader.upload(
-            io.BytesIO(raw2),
-            resource_type="image",
-            folder="streetsweep",
-        )
+        upload_response = await upload_image_async(raw2, folder="streetsweep")
         new_image_url = upload_response.get("secure_url")
 
         if ticket_id:
-            tickets.update_one({"_id": ObjectId(ticket_id)}, {"$set": {"image_url": new_image_url}})
+            await async_tickets.update_one({"_id": ObjectId(ticket_id)}, {"$set": {"image_url": new_image_url}})
         
-        severity = classify_image(raw2).get("severity", None)
-        tickets.update_one({"_id": ObjectId(ticket_id)}, {"$set": {"severity": severity}})
+        classified = await classify_image_async(after)
+        severity = classified.get("severity", None)
+        await async_tickets.update_one({"_id": ObjectId(ticket_id)}, {"$set": {"severity": severity}})
 
         return {
             "same_location": result.get("same_location"),
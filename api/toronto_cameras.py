@@ -0,0 +1,141 @@
+"""
+Toronto Open Data traffic camera metadata.
+
+The camera list changes on the order of months, so the parsed JSON is kept
+on disk and only re-downloaded once it is older than CACHE_TTL_SECONDS.
+"""
+
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from typing import Dict, TypedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson  # faster parse, falls back to the stdlib on minimal installs
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+CAMERA_JSON_URL = "https://opendata.toronto.ca/transportation/tmc/rescucameraimages/Data/tmcearthcameras.json"
+
+# Shared session so repeated fetches reuse the connection to opendata.toronto.ca
+_session = requests.Session()
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(total=3, backoff_factor=0.5),
+    ),
+)
+
+CACHE_PATH = Path.home() / ".cache" / "streetsweep" / "cameras.json"
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# {camera number: {"last_modified": header, "sha256": hex digest}} from the last run
+IMAGE_STATE_PATH = CACHE_PATH.parent / "camera_images.json"
+
+
+class CameraMeta(TypedDict):
+    number: str
+    name: str
+    latitude: float
+    longitude: float
+
+
+def _fetch_camera_metadata(url: str) -> dict:
+    """Downloads the camera JSON and strips its JSONP callback wrapper."""
+    response = _session.get(url, timeout=30)
+    response.raise_for_status()
+
+    # Format: jsonTMCEarthCamerasCallback({...data...});
+    json_text = response.text.strip()
+    if json_text.startswith("jsonTMCEarthCamerasCallback("):
+        json_text = json_text[json_text.index("(") + 1:json_text.rindex(")")]
+
+    return _json_loads(json_text)
+
+
+def _read_cache(url: str, max_age: float):
+    """Returns the cached metadata for url if it is fresh enough, else None."""
+    try:
+        if time.time() - CACHE_PATH.stat().st_mtime >= max_age:
+            return None
+        cached = _json_loads(CACHE_PATH.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+    if cached.get("url") != url:
+        return None
+    return cached.get("data")
+
+
+def _write_json_atomic(path: Path, obj):
+    """Writes JSON via a temp file + rename so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_cache(url: str, data: dict):
+    try:
+        _write_json_atomic(CACHE_PATH, {"url": url, "data": data})
+    except OSError as e:
+        print(f"✗ Could not write camera cache: {e}")
+
+
+def load_camera_metadata(url: str = CAMERA_JSON_URL, max_age: float = CACHE_TTL_SECONDS) -> dict:
+    """
+    Returns the parsed camera JSON ({"Data": [...]}), served from the on-disk
+    cache when it is younger than max_age seconds.
+    """
+    data = _read_cache(url, max_age)
+    if data is not None:
+        return data
+
+    data = _fetch_camera_metadata(url)
+    _write_cache(url, data)
+    return data
+
+
+def load_cameras(url: str = CAMERA_JSON_URL) -> Dict[str, CameraMeta]:
+    """Returns camera metadata keyed by camera number, in ascending number order."""
+    cameras = load_camera_metadata(url).get("Data", [])
+    cameras.sort(key=lambda x: int(x.get("Number", 0)))
+
+    camera_map = {}
+    for camera in cameras:
+        number = str(camera.get("Number"))
+        camera_map[number] = {
+            "number": number,
+            "name": camera.get("Name", f"Camera {number}"),
+            "latitude": float(camera.get("Latitude", 0)),
+            "longitude": float(camera.get("Longitude", 0)),
+        }
+    return camera_map
+
+
+def load_image_state() -> dict:
+    """Returns what was seen for each camera image on the last run (empty if unknown)."""
+    try:
+        return _json_loads(IMAGE_STATE_PATH.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_image_state(state: dict):
+    try:
+        _write_json_atomic(IMAGE_STATE_PATH, state)
+    except OSError as e:
+        print(f"✗ Could not write camera image state: {e}")
@@ -1,18 +1,21 @@
 from fastapi import APIRouter, HTTPException, status, Response
-from Database import UserRequest, Users  # your existing request model [file:413]
+from Database import UserRequest, Users, hash_password  # your existing request model [file:413]
 from users_service import register_user, fetch_user_by_id, fetch_all_users
 from pydantic import BaseModel
-from auth import verify_password, create_access_token
+from auth import verify_password, password_needs_rehash, create_access_token, create_refresh_token, verify_refresh_token
 
 router = APIRouter()
 
 class LoginRequest(BaseModel):
     email: str
     password: str
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 # ==================== AUTHENTICATION ENDPOINTS =============
 @router.post("/login")
-def login(data: LoginRequest, response: Response):
-    user = Users.find_one({"email": data.email})
+async def login(data: LoginRequest, response: Response):
+    user = await Users.find_one({"email": data.email})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -20,24 +23,40 @@ def login(data: LoginRequest, response: Response):
         )
 
     hashed = user.get("password_hash")
-    if not hashed or not verify_password(data.password, hashed):
+    if not hashed or not await verify_password(data.password, hashed):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
         )
+
+    # Upgrade legacy bcrypt hashes to argon2 while we have the plain password
+    if password_needs_rehash(hashed):
+        new_hash = await hash_password(data.password)
+        await Users.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password_hash": new_hash}},
+        )
     
     response.set_cookie(key="user_id", value=str(user["_id"]), httponly=True, samesite="lax")
 
     token = create_access_token(str(user["_id"]))
+    refresh_token = create_refresh_token(str(user["_id"]))
+    return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+@router.post("/refresh")
+def refresh(data: RefreshRequest):
+    """Issue a new access token from a refresh token, without checking the password again."""
+    user_id = verify_refresh_token(data.refresh_token)
+    token = create_access_token(user_id)
     return {"access_token": token, "token_type": "bearer"}
 
 # ==================== USER ENDPOINTS ====================
 
 @router.post("/create-user")
-def create_user_endpoint(user: UserRequest):
+async def create_user_endpoint(user: UserRequest):
     """Create a new user (volunteer or reporter)."""
     try:
-        return register_user(user)
+        return await register_user(user)
     except Exception as e:
         return {"error": str(e)}
     
@@ -48,10 +67,10 @@ def logout(response: Response):
     return {"message": "Logged out successfully"}
 
 @router.get("/users/{user_id}")
-def get_user(user_id: str):
+async def get_user(user_id: str):
     """Get user info by ID."""
     try:
-        user = fetch_user_by_id(user_id)
+        user = await fetch_user_by_id(user_id)
         if user:
             return user
         return {"error": "User not found"}
@@ -59,9 +78,9 @@ def get_user(user_id: str):
         return {"error": str(e)}
 
 @router.get("/users")
-def get_all_users():
+async def get_all_users():
     """Get all users."""
     try:
-        return {"users": fetch_all_users()}
+        return {"users": await fetch_all_users()}
     except Exception as e:
         return {"error": str(e)}
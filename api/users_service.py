@@ -1,30 +1,25 @@
 # users_service.py
 from bson.objectid import ObjectId
-from Database import create_user, users, UserRequest  # [file:413]
+from pymongo.errors import DuplicateKeyError
+from Database import create_user, async_users_json, UserRequest  # [file:413]
 
-def register_user(user: UserRequest) -> dict:
-    user_id = create_user(
-        name=user.name,
-        email=user.email,
-        password=user.password,
-    )
+async def register_user(user: UserRequest) -> dict:
+    try:
+        user_id = await create_user(
+            name=user.name,
+            email=user.email,
+            password=user.password,
+        )
+    except DuplicateKeyError:
+        raise ValueError("Email already registered")
     return {
         "user_id": user_id,
         "name": user.name,
         "email": user.email,
     }
 
-def fetch_user_by_id(user_id: str) -> dict | None:
-    user = users.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        return None
-    user["_id"] = str(user["_id"])
-    user.pop("password_hash", None)
-    return user
+async def fetch_user_by_id(user_id: str) -> dict | None:
+    return await async_users_json.find_one({"_id": ObjectId(user_id)}, projection={"password_hash": 0})
 
-def fetch_all_users() -> list[dict]:
-    all_users = list(users.find())
-    for user in all_users:
-        user["_id"] = str(user["_id"])
-        user.pop("password_hash", None)
-    return all_users
+async def fetch_all_users() -> list[dict]:
+    return await async_users_json.find({}, projection={"password_hash": 0}).to_list()
@@ -1,21 +1,82 @@
-import time
-from bson.objectid import ObjectId
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from bson import json_util
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
-def _serialize(doc: dict) -> dict:
-    if doc and "_id" in doc and isinstance(doc["_id"], ObjectId):
-        doc["_id"] = str(doc["_id"])
-    return doc
+# Identifies this process when holding a lease
+WORKER_ID = uuid.uuid4().hex
 
-def watch_ticket_inserts(tickets):
+# Oplog no longer holds the resume point
+CHANGE_STREAM_HISTORY_LOST = 286
+
+async def watch_ticket_inserts(tickets):
     pipeline = [{"$match": {"operationType": "insert"}}]
+    # Reopened streams pick up after the last event seen, so inserts made
+    # while reconnecting aren't missed
+    resume_token = None
 
     while True:
         try:
-            with tickets.watch(pipeline) as stream:
-                for change in stream:
-                    doc = change.get("fullDocument", {})
-                    doc = _serialize(doc)
-                    print(doc)
+            async with await tickets.watch(
+                pipeline,
+                resume_after=resume_token,
+                batch_size=500,  # bursts of inserts arrive in one reply
+                max_await_time_ms=5000,  # when idle, wait on the server instead of re-polling
+            ) as stream:
+                async for change in stream:
+                    # One pass over the whole document, nested ObjectIds and datetimes included
+                    print(json_util.dumps(change.get("fullDocument", {})))
+                    resume_token = stream.resume_token
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAM_HISTORY_LOST:
+                resume_token = None  # too far behind, start again from now
+            await asyncio.sleep(2)
         except Exception:
-            time.sleep(2)
+            await asyncio.sleep(2)
+
+async def _acquire_lease(leases, name: str, ttl: int) -> bool:
+    """Take or renew the named lease. False while another worker holds an unexpired one."""
+    now = datetime.now(timezone.utc)
+    try:
+        lease = await leases.find_one_and_update(
+            {"_id": name, "$or": [{"owner": WORKER_ID}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # The upsert lost to a lease held by another worker
+        return False
+    return lease is not None and lease["owner"] == WORKER_ID
+
+async def run_as_leader(leases, name: str, job, ttl: int = 30):
+    """
+    Run job() in only one worker at a time. Workers compete for a lease document;
+    the holder runs the job and renews the lease, the others retry until it expires.
+    """
+    while True:
+        try:
+            if not await _acquire_lease(leases, name, ttl):
+                await asyncio.sleep(ttl / 3)
+                continue
 
+            task = asyncio.create_task(job())
+            try:
+                while True:
+                    await asyncio.sleep(ttl / 3)
+                    if task.done() or not await _acquire_lease(leases, name, ttl):
+                        break
+            finally:
+                task.cancel()
+                try:
+                    await leases.delete_one({"_id": name, "owner": WORKER_ID})
+                except Exception:
+                    pass  # the lease expires on its own
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await asyncio.sleep(2)